@@ -1,6 +1,11 @@
+import hashlib
 import json
+import time
+
 import redis
 from openai import OpenAI
+from prometheus_client import Counter, Gauge, Histogram, start_http_server
+from stream_maintenance import group_stats, oldest_pending_age, trim_acknowledged
 
 REDIS_HOST = ""
 REDIS_PORT = 6379
@@ -11,6 +16,79 @@ SEARCH_INDEX_NAME = "products_idx"
 VECTOR_ALGORITHM = "COSINE"
 EMBED_DIM = 1536
 OPENAI_MODEL = "text-embedding-3-small"
+METRICS_PORT = 9108
+BATCH_SIZE = 10
+TRIM_INTERVAL_SECONDS = 60
+# Failed entries stay pending and are reclaimed once idle for this long; after
+# MAX_DELIVERIES attempts they are moved to the dead-letter stream and acked so
+# they no longer hold back stream trimming.
+CLAIM_IDLE_MS = 60000
+MAX_DELIVERIES = 5
+DEAD_LETTER_STREAM = "products_stream:dead"
+DEAD_LETTER_MAXLEN = 10000
+# Read by the API to build ETags; bumped after every batch that wrote products.
+CATALOG_VERSION_KEY = "catalog_version"
+# Fields that change often (price/stock sync, review counters) and are kept
+# out of the embedding text so that updating them never needs a new embedding.
+NON_EMBEDDED_FIELDS = (
+    "id",
+    "image",
+    "price",
+    "inStock",
+    "rating",
+    "reviews",
+    "warehouse_location",
+    "warehouse_geolocation",
+)
+INTERNAL_FIELDS = ("embedding", "content_hash")
+
+PRODUCTS_INDEXED = Counter(
+    "indexer_products_indexed_total", "Products written to the search index."
+)
+INDEX_ERRORS = Counter("indexer_errors_total", "Stream messages that failed to index.")
+BATCH_SIZE_HIST = Histogram(
+    "indexer_batch_size",
+    "Number of stream entries returned per XREADGROUP call.",
+    buckets=(1, 2, 5, 10, 20, 50, 100),
+)
+INDEX_DURATION = Histogram(
+    "indexer_index_duration_seconds", "Time to embed and store a single product."
+)
+EMBEDDING_DURATION = Histogram(
+    "indexer_embedding_duration_seconds", "Latency of embedding API calls."
+)
+CONSUMER_LAG = Gauge(
+    "indexer_consumer_lag", "Stream entries not yet delivered to the consumer group."
+)
+EMBEDDINGS_SKIPPED = Counter(
+    "indexer_embeddings_skipped_total",
+    "Product updates applied without a new embedding because the content hash matched.",
+)
+PARTIAL_UPDATES = Counter(
+    "indexer_partial_updates_total", "Partial JSON.SET updates applied to products."
+)
+PENDING_MESSAGES = Gauge(
+    "indexer_pending_messages", "Delivered stream entries awaiting acknowledgement."
+)
+STREAM_LENGTH = Gauge("indexer_stream_length", "Entries currently held in the stream.")
+STREAM_TRIMMED = Counter(
+    "indexer_stream_trimmed_total", "Acknowledged stream entries removed by XTRIM."
+)
+RETRIES = Counter(
+    "indexer_retries_total", "Failed stream entries reclaimed for another attempt."
+)
+DEAD_LETTERED = Counter(
+    "indexer_dead_lettered_total", "Stream entries moved to the dead-letter stream."
+)
+OLDEST_PENDING_AGE = Gauge(
+    "indexer_oldest_pending_age_seconds",
+    "Age of the oldest delivered but unacknowledged stream entry.",
+)
+
+
+class InvalidMessage(Exception):
+    """A stream entry that can never be applied, however often it is retried."""
+
 
 redis_client = redis.Redis(
     host='',
@@ -64,44 +142,229 @@ def drop_index():
 def generate_embedding(text: str):
     if not text.strip():
         return [0.0] * EMBED_DIM
-    resp = openai_client.embeddings.create(input=text, model=OPENAI_MODEL)
+    with EMBEDDING_DURATION.time():
+        resp = openai_client.embeddings.create(input=text, model=OPENAI_MODEL)
     return resp.data[0].embedding
 
 
+def embedding_text(product: dict) -> str:
+    return ", ".join(
+        f"{k}: {v}"
+        for k, v in product.items()
+        if k not in NON_EMBEDDED_FIELDS and k not in INTERNAL_FIELDS
+    )
+
+
+def content_hash(text: str) -> str:
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+def field_path(field: str) -> str:
+    # Bracket notation also works for keys that are not identifiers.
+    return f"$[{json.dumps(field)}]"
+
+
+def apply_partial_update(key: str, changes: dict, removed=()) -> list:
+    """JSON.SET only the paths whose values differ from the stored document.
+
+    Top-level fields listed in ``removed`` are deleted.
+    """
+    changed = []
+    pipe = redis_client.pipeline(transaction=False)
+    if changes:
+        paths = [field_path(field) for field in changes]
+        current = redis_client.json().get(key, *paths)
+        if len(paths) == 1:
+            current = {paths[0]: current}
+
+        for field, value in changes.items():
+            stored = current.get(field_path(field)) or []
+            if stored and stored[0] == value:
+                continue
+            pipe.json().set(key, field_path(field), value)
+            changed.append(field)
+    for field in removed:
+        pipe.json().delete(key, field_path(field))
+        changed.append(field)
+    if changed:
+        pipe.execute()
+        PARTIAL_UPDATES.inc()
+    return changed
+
+
+@INDEX_DURATION.time()
 def index_product(product: dict):
-    key_value_str = ", ".join(f"{k}: {v}" for k, v in product.items() if k not in ("id", "image"))
-    embedding = generate_embedding(key_value_str)
-    product["embedding"] = embedding
     # product_id = redis_client.incr("pid_cnt")
     # product["id"] = int(product_id)
     key = f"product:{product['id']}"
+    text = embedding_text(product)
+    new_hash = content_hash(text)
+
+    stored_hash = redis_client.json().get(key, "$.content_hash")
+    if stored_hash and stored_hash[0] == new_hash:
+        changes = {k: v for k, v in product.items() if k not in INTERNAL_FIELDS}
+        # A product message carries the whole document, so stored fields it
+        # no longer has (e.g. a dropped warehouse_geolocation) must go too.
+        removed = [
+            k
+            for k in redis_client.json().objkeys(key)
+            if k not in product and k not in INTERNAL_FIELDS
+        ]
+        changed = apply_partial_update(key, changes, removed)
+        EMBEDDINGS_SKIPPED.inc()
+        print(f"♻️ Updated product {product['id']} without re-embedding: {changed}")
+        return
+
+    product["embedding"] = generate_embedding(text)
+    product["content_hash"] = new_hash
     redis_client.json().set(key, "$", product)
+    PRODUCTS_INDEXED.inc()
     print(f"📦 Indexed product: {product['id']}")
 
+
+def update_product(update: dict):
+    """Apply an explicit partial update message (``id`` plus changed fields)."""
+    key = f"product:{update['id']}"
+    changes = {
+        k: v for k, v in update.items() if k != "id" and k not in INTERNAL_FIELDS
+    }
+    if any(k not in NON_EMBEDDED_FIELDS for k in changes):
+        # Embedding-relevant content changed, so rebuild the full document and
+        # let the content hash decide whether a new embedding is needed.
+        product = redis_client.json().get(key)
+        if product is None:
+            raise InvalidMessage(f"Cannot apply partial update, {key} does not exist")
+        product.update(changes)
+        index_product(product)
+        return
+
+    if not redis_client.exists(key):
+        raise InvalidMessage(f"Cannot apply partial update, {key} does not exist")
+    changed = apply_partial_update(key, changes)
+    print(f"✏️ Partially updated product {update['id']}: {changed}")
+
+
+def update_lag_metrics():
+    stats = group_stats(redis_client, STREAM_NAME, GROUP_NAME)
+    CONSUMER_LAG.set(stats["lag"])
+    PENDING_MESSAGES.set(stats["pending"])
+    STREAM_LENGTH.set(redis_client.xlen(STREAM_NAME))
+    OLDEST_PENDING_AGE.set(oldest_pending_age(redis_client, STREAM_NAME, GROUP_NAME))
+
+
+def trim_stream():
+    trimmed = trim_acknowledged(redis_client, STREAM_NAME)
+    STREAM_TRIMMED.inc(trimmed)
+    if trimmed:
+        print(f"✂️ Trimmed {trimmed} acknowledged entries from '{STREAM_NAME}'")
+
+
+def dead_letter(entry_id: str, data: dict, error: str, deliveries: int):
+    """Copy an entry to the dead-letter stream and acknowledge it atomically."""
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.xadd(
+        DEAD_LETTER_STREAM,
+        {**data, "source_id": entry_id, "error": error, "deliveries": deliveries},
+        maxlen=DEAD_LETTER_MAXLEN,
+        approximate=True,
+    )
+    pipe.xack(STREAM_NAME, GROUP_NAME, entry_id)
+    pipe.execute()
+    DEAD_LETTERED.inc()
+    print(f"☠️ Dead-lettered message {entry_id} after {deliveries} attempts: {error}")
+
+
+def handle_entry(entry_id: str, data: dict, deliveries: int = 1) -> bool:
+    """Index one stream entry and ack it; failures are left pending for retry."""
+    try:
+        if "update" in data:
+            update_product(json.loads(data["update"]))
+        else:
+            product_data = json.loads(data["product"])
+            index_product(product_data)
+        # ✅ Acknowledge message
+        redis_client.xack(STREAM_NAME, GROUP_NAME, entry_id)
+        print(f"📨 Acknowledged message {entry_id}")
+        return True
+    except (InvalidMessage, json.JSONDecodeError) as e:
+        # Redelivery cannot fix these, so do not let them sit in the PEL.
+        INDEX_ERRORS.inc()
+        dead_letter(entry_id, data, str(e), deliveries)
+        return False
+    except Exception as e:
+        INDEX_ERRORS.inc()
+        print(f"❌ Error processing message {entry_id}: {e}")
+        return False
+
+
+def reclaim_pending() -> int:
+    """Retry entries that failed earlier, dead-lettering repeated failures."""
+    reply = redis_client.xautoclaim(
+        STREAM_NAME,
+        GROUP_NAME,
+        CONSUMER_NAME,
+        min_idle_time=CLAIM_IDLE_MS,
+        start_id="0-0",
+        count=BATCH_SIZE,
+    )
+    # Redis 7 appends a list of deleted IDs to the reply; 6.2 does not.
+    entries = reply[1]
+    if not entries:
+        return 0
+
+    deliveries = {
+        info["message_id"]: info["times_delivered"]
+        for info in redis_client.xpending_range(
+            STREAM_NAME,
+            GROUP_NAME,
+            min=entries[0][0],
+            max=entries[-1][0],
+            count=len(entries),
+            consumername=CONSUMER_NAME,
+        )
+    }
+    written = 0
+    for entry_id, data in entries:
+        attempts = deliveries.get(entry_id, 1)
+        if attempts > MAX_DELIVERIES:
+            dead_letter(entry_id, data, "max deliveries exceeded", attempts - 1)
+            continue
+        RETRIES.inc()
+        written += handle_entry(entry_id, data, attempts)
+    return written
+
+
 def process_stream():
-    print(f"🚀 Listening for new products on stream '{STREAM_NAME}' in group '{GROUP_NAME}'...")
+    print(
+        f"🚀 Listening for new products on stream '{STREAM_NAME}' "
+        f"in group '{GROUP_NAME}'..."
+    )
+    last_trim = time.monotonic()
     while True:
+        written = reclaim_pending()
         messages = redis_client.xreadgroup(
             groupname=GROUP_NAME,
             consumername=CONSUMER_NAME,
             streams={STREAM_NAME: ">"},
-            count=10,
-            block=5000
+            count=BATCH_SIZE,
+            block=5000,
         )
         if messages:
             for stream_name, entries in messages:
+                BATCH_SIZE_HIST.observe(len(entries))
                 for entry_id, data in entries:
-                    try:
-                        product_data = json.loads(data["product"])
-                        index_product(product_data)
-                        # ✅ Acknowledge message
-                        redis_client.xack(STREAM_NAME, GROUP_NAME, entry_id)
-                        print(f"📨 Acknowledged message {entry_id}")
-                    except Exception as e:
-                        print(f"❌ Error processing message {entry_id}: {e}")
+                    written += handle_entry(entry_id, data)
+        if written:
+            redis_client.incr(CATALOG_VERSION_KEY)
+        update_lag_metrics()
+        if time.monotonic() - last_trim >= TRIM_INTERVAL_SECONDS:
+            trim_stream()
+            last_trim = time.monotonic()
 
 
 if __name__ == "__main__":
+    start_http_server(METRICS_PORT)
+    print(f"📈 Serving indexer metrics on :{METRICS_PORT}/metrics")
     drop_index()
     ensure_index()
     process_stream()
@@ -1,4 +1,18 @@
+import argparse
+import json
+import os
+import sys
+import time
+
 import redis
+from stream_maintenance import group_stats
+
+STREAM_NAME = "products_stream"
+GROUP_NAME = "product_indexers"
+DEFAULT_CHUNK_SIZE = 500
+DEFAULT_MAX_LAG = 10000
+LAG_POLL_SECONDS = 1.0
+REPORT_INTERVAL_SECONDS = 5.0
 
 redis_client = redis.Redis(
     host='',
@@ -8,6 +22,143 @@ redis_client = redis.Redis(
     password="",
 )
 
-with open("sample_data.json", "r") as f:
-    for line in f:
-        redis_client.xadd("products_stream", {"product": line})
+
+class LagExceeded(Exception):
+    pass
+
+
+def consumer_lag() -> int:
+    """Number of stream entries the indexer group has not consumed yet."""
+    return group_stats(redis_client, STREAM_NAME, GROUP_NAME)["lag"]
+
+
+def wait_for_capacity(max_lag: int, on_lag: str):
+    """Block (or shed) while the consumer group is more than ``max_lag`` behind."""
+    lag = consumer_lag()
+    if lag <= max_lag:
+        return
+    if on_lag == "shed":
+        raise LagExceeded(f"Consumer lag {lag} exceeds {max_lag}")
+    print(f"⏳ Consumer lag {lag} exceeds {max_lag}, waiting for the indexer...")
+    while lag > max_lag:
+        time.sleep(LAG_POLL_SECONDS)
+        lag = consumer_lag()
+
+
+def file_identity(f) -> dict:
+    """Identify a catalog file so a checkpoint is only resumed on the same one.
+
+    A new catalog written to the same path gets a new inode, size or mtime.
+    """
+    st = os.fstat(f.fileno())
+    return {"inode": st.st_ino, "size": st.st_size, "mtime_ns": st.st_mtime_ns}
+
+
+def read_checkpoint(path: str, identity: dict) -> int:
+    """Byte offset to resume from, or 0 if the checkpoint is for another file."""
+    if not os.path.exists(path):
+        return 0
+    with open(path, "r") as f:
+        try:
+            checkpoint = json.load(f)
+        except json.JSONDecodeError:
+            checkpoint = None
+    if not isinstance(checkpoint, dict) or checkpoint.get("file") != identity:
+        print(
+            f"⚠️ Checkpoint '{path}' does not match the current file, "
+            "starting from the beginning"
+        )
+        return 0
+    return checkpoint["offset"]
+
+
+def write_checkpoint(path: str, offset: int, identity: dict):
+    # Write-then-rename so an interrupted load never leaves a torn checkpoint.
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({"offset": offset, "file": identity}, f)
+    os.replace(tmp_path, path)
+
+
+def load(path: str, chunk_size: int, max_lag: int, checkpoint_path: str, on_lag: str):
+    rows = 0
+    started = time.monotonic()
+    last_report = started
+    with open(path, "rb") as f:
+        identity = file_identity(f)
+        offset = read_checkpoint(checkpoint_path, identity)
+        if offset:
+            print(f"↩️ Resuming '{path}' from byte offset {offset}")
+        f.seek(offset)
+        while True:
+            wait_for_capacity(max_lag, on_lag)
+
+            pipe = redis_client.pipeline(transaction=False)
+            queued = 0
+            for line in f:
+                if not line.strip():
+                    continue
+                pipe.xadd(STREAM_NAME, {"product": line.decode("utf-8")})
+                queued += 1
+                if queued >= chunk_size:
+                    break
+            if not queued:
+                break
+
+            pipe.execute()
+            # Checkpoint only after the chunk is in Redis; a crash before this
+            # point replays the chunk, which the indexer handles idempotently.
+            offset = f.tell()
+            write_checkpoint(checkpoint_path, offset, identity)
+
+            rows += queued
+            now = time.monotonic()
+            if now - last_report >= REPORT_INTERVAL_SECONDS:
+                rate = rows / (now - started)
+                print(f"📤 {rows} rows at {rate:.0f} rows/sec (offset {offset})")
+                last_report = now
+
+    elapsed = time.monotonic() - started
+    rate = rows / elapsed if elapsed else 0.0
+    print(f"✅ Loaded {rows} rows in {elapsed:.1f}s ({rate:.0f} rows/sec)")
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Bulk load a JSON-lines product catalog into the products stream."
+    )
+    parser.add_argument("file", nargs="?", default="sample_data.json")
+    parser.add_argument("--chunk-size", type=int, default=DEFAULT_CHUNK_SIZE)
+    parser.add_argument(
+        "--max-lag",
+        type=int,
+        default=DEFAULT_MAX_LAG,
+        help="Pause while the indexer group is more than this many entries behind.",
+    )
+    parser.add_argument(
+        "--on-lag",
+        choices=("block", "shed"),
+        default="block",
+        help="Wait for the indexer to catch up, or stop and keep the checkpoint.",
+    )
+    parser.add_argument(
+        "--checkpoint",
+        default=None,
+        help="Byte-offset checkpoint file (defaults to <file>.checkpoint).",
+    )
+    parser.add_argument(
+        "--restart", action="store_true", help="Ignore any existing checkpoint."
+    )
+    args = parser.parse_args()
+
+    checkpoint_path = args.checkpoint or f"{args.file}.checkpoint"
+    if args.restart and os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
+
+    try:
+        load(args.file, args.chunk_size, args.max_lag, checkpoint_path, args.on_lag)
+    except LagExceeded as e:
+        print(f"🛑 {e}; stopping, rerun to resume from '{checkpoint_path}'")
+        sys.exit(75)  # EX_TEMPFAIL: safe to retry later
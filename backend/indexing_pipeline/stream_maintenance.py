@@ -0,0 +1,111 @@
+import argparse
+import time
+from typing import Optional
+
+import redis
+
+STREAM_NAME = "products_stream"
+GROUP_NAME = "product_indexers"
+TRIM_INTERVAL_SECONDS = 60
+
+
+def _parse_id(entry_id: str) -> tuple:
+    ms, _, seq = entry_id.partition("-")
+    return int(ms), int(seq or 0)
+
+
+def group_stats(redis_client: redis.Redis, stream: str, group: str) -> dict:
+    """Return ``lag`` (undelivered entries) and ``pending`` (unacked) for a group."""
+    try:
+        groups = redis_client.xinfo_groups(stream)
+    except redis.exceptions.ResponseError:
+        return {"lag": 0, "pending": 0}
+
+    for info in groups:
+        if info["name"] != group:
+            continue
+        lag = info.get("lag")
+        if lag is None:
+            # ``lag`` is missing on Redis < 7 and None when Redis cannot
+            # compute it; the stream length is a safe upper bound then.
+            lag = redis_client.xlen(stream)
+        return {"lag": lag, "pending": info["pending"]}
+    return {"lag": 0, "pending": 0}
+
+
+def oldest_pending_age(redis_client: redis.Redis, stream: str, group: str) -> float:
+    """Seconds since the oldest unacknowledged entry of ``group`` was added."""
+    try:
+        pending = redis_client.xpending(stream, group)
+    except redis.exceptions.ResponseError:
+        return 0.0
+    if not pending["pending"]:
+        return 0.0
+    ms, _ = _parse_id(pending["min"])
+    return max(0.0, time.time() - ms / 1000)
+
+
+def safe_trim_id(redis_client: redis.Redis, stream: str) -> Optional[str]:
+    """Smallest entry ID that some consumer group may still need.
+
+    Everything below it has been delivered to and acknowledged by every
+    group, so it can be removed with ``XTRIM MINID``. Returns None when the
+    stream has no groups, since nothing is known to be consumed then.
+    """
+    try:
+        groups = redis_client.xinfo_groups(stream)
+    except redis.exceptions.ResponseError:
+        return None
+    if not groups:
+        return None
+
+    candidates = []
+    for info in groups:
+        pending = redis_client.xpending(stream, info["name"])
+        if pending["pending"]:
+            candidates.append(_parse_id(pending["min"]))
+        else:
+            ms, seq = _parse_id(info["last-delivered-id"])
+            candidates.append((ms, seq + 1))
+
+    ms, seq = min(candidates)
+    return f"{ms}-{seq}"
+
+
+def trim_acknowledged(redis_client: redis.Redis, stream: str) -> int:
+    """Trim entries that every consumer group has acknowledged."""
+    min_id = safe_trim_id(redis_client, stream)
+    if min_id is None:
+        return 0
+    # Approximate trimming only removes whole radix-tree nodes, which is much
+    # cheaper and never removes anything at or above ``min_id``.
+    return redis_client.xtrim(stream, minid=min_id, approximate=True)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Periodically trim acknowledged entries from the products stream."
+    )
+    parser.add_argument("--interval", type=float, default=TRIM_INTERVAL_SECONDS)
+    parser.add_argument("--once", action="store_true", help="Trim once and exit.")
+    args = parser.parse_args()
+
+    redis_client = redis.Redis(
+        host="",
+        port=13451,
+        decode_responses=True,
+        username="default",
+        password="",
+    )
+
+    while True:
+        trimmed = trim_acknowledged(redis_client, STREAM_NAME)
+        stats = group_stats(redis_client, STREAM_NAME, GROUP_NAME)
+        length = redis_client.xlen(STREAM_NAME)
+        print(
+            f"✂️ Trimmed {trimmed} entries; length={length} "
+            f"lag={stats['lag']} pending={stats['pending']}"
+        )
+        if args.once:
+            break
+        time.sleep(args.interval)
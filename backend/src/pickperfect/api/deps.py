@@ -1,15 +1,56 @@
-from fastapi import Depends, HTTPException, status
-from fastapi.security import OAuth2PasswordBearer
+import secrets
+from typing import Optional
 
+from fastapi import Depends, HTTPException, Request, Security, status
+from fastapi.security import APIKeyHeader, OAuth2PasswordBearer
+
+from ..config.settings import settings
 from ..core.database import get_redis_client
+from ..core.local_vectors import LocalVectorIndex
+from ..core.near_cache import NearCache
 from ..core.security import verify_token
 from ..models.user import UserInDB
-from ..services.user_service import user_service
+from ..services.product_service import ProductService
+from ..services.query_profiler import QueryProfiler
+from ..services.recommendation_service import RecommendationService
+from ..services.user_service import UserService
 
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="auth/login")
+diagnostics_token_header = APIKeyHeader(name="X-Diagnostics-Token", auto_error=False)
+
+# The services live on ``app.state``, set by the lifespan. These dependencies
+# are ``async def`` so FastAPI resolves them on the event loop instead of
+# dispatching a threadpool call per dependency per request.
+
+
+async def get_user_service(request: Request) -> UserService:
+    return request.app.state.user_service
+
+
+async def get_product_service(request: Request) -> ProductService:
+    return request.app.state.product_service
+
+
+async def get_recommendation_service(request: Request) -> RecommendationService:
+    return request.app.state.recommendation_service
+
+
+async def get_query_profiler(request: Request) -> QueryProfiler:
+    return request.app.state.query_profiler
+
 
+async def get_product_cache(request: Request) -> Optional[NearCache]:
+    return request.app.state.product_cache
 
-async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
+
+async def get_local_vector_index(request: Request) -> Optional[LocalVectorIndex]:
+    return request.app.state.local_vector_index
+
+
+async def get_current_user(
+    token: str = Depends(oauth2_scheme),
+    user_service: UserService = Depends(get_user_service),
+) -> UserInDB:
     """Get current authenticated user."""
     redis_client = get_redis_client()
 
@@ -40,3 +81,21 @@ async def get_current_user(token: str = Depends(oauth2_scheme)) -> UserInDB:
         )
 
     return user
+
+
+async def require_diagnostics_token(
+    token: Optional[str] = Security(diagnostics_token_header),
+) -> None:
+    """Allow only operators holding ``DIAGNOSTICS_TOKEN``.
+
+    Registration is open, so being logged in is not enough: the slow-query log
+    exposes other users' searches.
+    """
+    if not settings.diagnostics_token:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND, detail="Diagnostics are disabled"
+        )
+    if token is None or not secrets.compare_digest(token, settings.diagnostics_token):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN, detail="Invalid diagnostics token"
+        )
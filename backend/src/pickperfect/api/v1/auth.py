@@ -4,16 +4,19 @@ from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
 
 from ...core.database import get_redis_client
+from ...core.middleware import TimedRoute
 from ...core.security import create_access_token, verify_token
 from ...models.user import UserCreate, UserLogin, UserResponse
-from ...services.user_service import user_service
-from ..deps import oauth2_scheme
+from ...services.user_service import UserService
+from ..deps import get_user_service, oauth2_scheme
 
-router = APIRouter(prefix="/auth", tags=["authentication"])
+router = APIRouter(prefix="/auth", tags=["authentication"], route_class=TimedRoute)
 
 
 @router.post("/register")
-async def register(user: UserCreate):
+async def register(
+    user: UserCreate, user_service: UserService = Depends(get_user_service)
+):
     """Register a new user."""
     try:
         user_service.create_user(user)
@@ -25,7 +28,10 @@ async def register(user: UserCreate):
 
 
 @router.post("/login", response_model=UserLogin)
-async def login(form_data: OAuth2PasswordRequestForm = Depends()):
+async def login(
+    form_data: OAuth2PasswordRequestForm = Depends(),
+    user_service: UserService = Depends(get_user_service),
+):
     """Login user and return access token."""
     user = user_service.authenticate_user(form_data.username, form_data.password)
 
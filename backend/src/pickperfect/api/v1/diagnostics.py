@@ -0,0 +1,59 @@
+from typing import Optional
+
+from fastapi import APIRouter, Depends
+
+from ...core.local_vectors import LocalVectorIndex
+from ...core.middleware import TimedRoute
+from ...core.near_cache import NearCache
+from ...services.query_profiler import QueryProfiler
+from ..deps import (
+    get_local_vector_index,
+    get_product_cache,
+    get_query_profiler,
+    require_diagnostics_token,
+)
+
+router = APIRouter(
+    prefix="/diagnostics",
+    tags=["diagnostics"],
+    route_class=TimedRoute,
+    dependencies=[Depends(require_diagnostics_token)],
+)
+
+
+@router.get("/slow-queries")
+async def get_slow_query_shapes(
+    limit: int = 10,
+    query_profiler: QueryProfiler = Depends(get_query_profiler),
+):
+    """Get the slowest logged search query shapes."""
+    return {"shapes": query_profiler.slowest_shapes(limit)}
+
+
+@router.get("/slow-queries/recent")
+async def get_recent_slow_queries(
+    limit: int = 50,
+    query_profiler: QueryProfiler = Depends(get_query_profiler),
+):
+    """Get the most recent slow-query log entries with their FT.PROFILE output."""
+    return {"queries": query_profiler.recent(limit)}
+
+
+@router.get("/near-cache")
+async def get_near_cache_stats(
+    product_cache: Optional[NearCache] = Depends(get_product_cache),
+):
+    """Get hit, miss and invalidation counters of the product near cache."""
+    if product_cache is None:
+        return {"enabled": False}
+    return product_cache.stats()
+
+
+@router.get("/local-vectors")
+async def get_local_vector_stats(
+    local_vectors: Optional[LocalVectorIndex] = Depends(get_local_vector_index),
+):
+    """Get the snapshot generation and size loaded by the local vector engine."""
+    if local_vectors is None:
+        return {"enabled": False}
+    return local_vectors.stats()
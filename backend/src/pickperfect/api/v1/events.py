@@ -1,15 +1,18 @@
 import json
 import time
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request, Response
 
+from ...config.settings import settings
 from ...core.database import get_redis_client
+from ...core.http_cache import TRENDING_VERSION_KEY, check_not_modified
+from ...core.middleware import TimedRoute
 from ...models.event import UserEvent
 from ...models.user import UserInDB
-from ...services.recommendation_service import recommendation_service
-from ..deps import get_current_user
+from ...services.recommendation_service import RecommendationService
+from ..deps import get_current_user, get_recommendation_service
 
-router = APIRouter(tags=["events"])
+router = APIRouter(tags=["events"], route_class=TimedRoute)
 
 
 @router.post("/events")
@@ -34,6 +37,7 @@ async def track_user_event(event: UserEvent):
     # Update trending scores
     redis_client.zincrby("trending_products", 1, event.product_id)
     redis_client.zincrby("trending_categories", 1, event.category)
+    redis_client.incr(TRENDING_VERSION_KEY)
 
     return {"message": "Event tracked successfully"}
 
@@ -41,6 +45,7 @@ async def track_user_event(event: UserEvent):
 @router.get("/recommendations")
 async def get_personalized_recommendations(
     current_user: UserInDB = Depends(get_current_user),
+    recommendation_service: RecommendationService = Depends(get_recommendation_service),
 ):
     """Get personalized product recommendations for the user."""
     products = recommendation_service.get_personalized_recommendations(
@@ -50,8 +55,19 @@ async def get_personalized_recommendations(
 
 
 @router.get("/categories/trending")
-async def get_trending_categories(limit: int = 10):
+async def get_trending_categories(
+    request: Request, response: Response, limit: int = 10
+):
     """Get trending categories."""
+    not_modified = check_not_modified(
+        request,
+        response,
+        (TRENDING_VERSION_KEY,),
+        settings.cache_control_trending_categories,
+    )
+    if not_modified:
+        return not_modified
+
     redis_client = get_redis_client()
     categories = redis_client.zrevrange("trending_categories", 0, limit - 1)
     return {"categories": categories}
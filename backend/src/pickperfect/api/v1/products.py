@@ -1,7 +1,15 @@
-from typing import List
+from typing import List, Optional
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Query, Request, Response
 
+from ...config.settings import settings
+from ...core.http_cache import (
+    CATALOG_VERSION_KEY,
+    TRENDING_VERSION_KEY,
+    check_not_modified,
+    drop_validators,
+)
+from ...core.middleware import TimedRoute
 from ...models.product import (
     FilterRequest,
     Product,
@@ -9,15 +17,30 @@ from ...models.product import (
     ProductSearchResponse,
 )
 from ...models.user import UserInDB
-from ...services.product_service import product_service
-from ..deps import get_current_user
+from ...services.product_service import ProductService
+from ..deps import get_current_user, get_product_service
 
-router = APIRouter(prefix="/products", tags=["products"])
+router = APIRouter(prefix="/products", tags=["products"], route_class=TimedRoute)
 
 
 @router.post("/", response_model=ProductSearchResponse)
-async def fetch_products(input_data: ProductSearch):
+async def fetch_products(
+    input_data: ProductSearch,
+    request: Request,
+    response: Response,
+    product_service: ProductService = Depends(get_product_service),
+):
     """Fetch products with optional search query."""
+    not_modified = check_not_modified(
+        request,
+        response,
+        (CATALOG_VERSION_KEY,),
+        settings.cache_control_products,
+        input_data.model_dump_json(),
+    )
+    if not_modified:
+        return not_modified
+
     if input_data.query:
         products = product_service.vector_search(input_data.query)
     else:
@@ -27,30 +50,64 @@ async def fetch_products(input_data: ProductSearch):
 
 
 @router.get("/trending")
-async def get_trending_products(limit: int = 10):
+async def get_trending_products(
+    request: Request,
+    response: Response,
+    limit: int = 10,
+    product_service: ProductService = Depends(get_product_service),
+):
     """Get trending products."""
+    not_modified = check_not_modified(
+        request,
+        response,
+        (CATALOG_VERSION_KEY, TRENDING_VERSION_KEY),
+        settings.cache_control_trending_products,
+    )
+    if not_modified:
+        return not_modified
+
     products = product_service.get_trending_products(limit)
     return {"products": products}
 
 
 @router.get("/near-by")
-async def search_near_location(current_user: UserInDB = Depends(get_current_user)):
-    """Search products near user location."""
-    lon = current_user.longitude
-    lat = current_user.latitude
-
-    products = product_service.multi_parameter_search(geo_location=[lon, lat])
-
-    if not products:
-        products = product_service.multi_parameter_search(
-            geo_location=[77.209, 28.6139]
-        )
-
+async def search_near_location(
+    radius_km: Optional[float] = Query(default=None, gt=0),
+    limit: int = Query(default=20, gt=0),
+    current_user: UserInDB = Depends(get_current_user),
+    product_service: ProductService = Depends(get_product_service),
+):
+    """Search products near user location, sorted by distance."""
+    products = product_service.search_nearby(
+        current_user.longitude, current_user.latitude, radius_km, limit
+    )
     return {"products": products}
 
 
 @router.post("/filter")
-async def filter_products(filter_request: FilterRequest):
+async def filter_products(
+    filter_request: FilterRequest,
+    request: Request,
+    response: Response,
+    product_service: ProductService = Depends(get_product_service),
+):
     """Filter products based on criteria."""
-    products = product_service.filter_products(filter_request)
+    not_modified = check_not_modified(
+        request,
+        response,
+        (CATALOG_VERSION_KEY,),
+        settings.cache_control_filter,
+        filter_request.model_dump_json(),
+    )
+    if not_modified:
+        return not_modified
+
+    try:
+        products = product_service.filter_products(filter_request)
+    except Exception as e:
+        # An empty result from a failed search must not be stored by clients
+        # or revalidated into a 304 until the catalog changes.
+        print(f"Filter search error: {e}")
+        drop_validators(response)
+        return {"products": []}
     return {"products": products}
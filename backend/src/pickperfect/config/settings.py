@@ -9,6 +9,8 @@ class Settings(BaseSettings):
     secret_key: str = Field(default="your-secret-key-change-in-production")
     algorithm: str = Field(default="HS256")
     access_token_expire_minutes: int = Field(default=30)
+    # Shared secret for the /diagnostics routes; they are disabled when empty.
+    diagnostics_token: str = Field(default="")
 
     # Redis Configuration
     redis_host: str = Field(
@@ -20,6 +22,28 @@ class Settings(BaseSettings):
     search_index_name: str = Field(default="products_idx")
     redis_bloom_filter: str = Field(default="usersBF")
 
+    # Near cache of product documents (requires Redis 6+ client tracking)
+    near_cache_enabled: bool = Field(default=False)
+    near_cache_max_entries: int = Field(default=10000)
+
+    # Local vector engine (memory-mapped embedding matrix for in-process KNN)
+    local_vectors_enabled: bool = Field(default=False)
+    local_vectors_path: str = Field(default="data/local_vectors")
+    local_vectors_group: str = Field(default="local_vectors")
+    products_stream: str = Field(default="products_stream")
+    indexer_group: str = Field(default="product_indexers")
+
+    # Geo Search
+    geo_search_radius_km: float = Field(default=2000.0)
+    geo_max_radius_km: float = Field(default=5000.0)
+    geo_max_limit: int = Field(default=100)
+    geo_cell_precision: int = Field(default=5)
+    geo_cache_ttl_seconds: int = Field(default=300)
+
+    # Precomputed recommendations
+    recommendation_precompute_ttl_seconds: int = Field(default=3600)
+    recommendation_active_hours: int = Field(default=24)
+
     # OpenAI Configuration
     openai_api_key: str = Field(default="")
 
@@ -29,6 +53,22 @@ class Settings(BaseSettings):
     cors_allow_methods: List[str] = Field(default=["*"])
     cors_allow_headers: List[str] = Field(default=["*"])
 
+    # Observability
+    metrics_enabled: bool = Field(default=True)
+    server_timing_enabled: bool = Field(default=True)
+    query_profile_sample_rate: float = Field(default=0.01)
+    query_profile_slow_ms: float = Field(default=100.0)
+    query_profile_stream: str = Field(default="slow_queries")
+    query_profile_maxlen: int = Field(default=1000)
+    query_profile_queue_size: int = Field(default=100)
+    query_profile_shape_interval_seconds: float = Field(default=10.0)
+
+    # HTTP caching (Cache-Control sent alongside the ETag, per endpoint)
+    cache_control_products: str = Field(default="public, max-age=60")
+    cache_control_trending_products: str = Field(default="public, max-age=10")
+    cache_control_trending_categories: str = Field(default="public, max-age=10")
+    cache_control_filter: str = Field(default="public, max-age=60")
+
     # Application
     app_title: str = Field(default="PickPerfect with RedisAI")
     app_version: str = Field(default="1.0.0")
@@ -1,8 +1,38 @@
-from typing import Optional
+import time
+from typing import Any, List, Optional
 
 import redis
+from redis.client import Pipeline
 
 from ..config.settings import settings
+from .metrics import observe_redis_command
+
+
+class InstrumentedPipeline(Pipeline):
+    def execute(self, raise_on_error: bool = True) -> List[Any]:
+        start = time.perf_counter()
+        try:
+            return super().execute(raise_on_error)
+        finally:
+            observe_redis_command("PIPELINE", time.perf_counter() - start)
+
+
+class InstrumentedRedis(redis.Redis):
+    """Redis client that reports every command's latency to the metrics layer."""
+
+    def execute_command(self, *args: Any, **options: Any) -> Any:
+        start = time.perf_counter()
+        try:
+            return super().execute_command(*args, **options)
+        finally:
+            observe_redis_command(str(args[0]).upper(), time.perf_counter() - start)
+
+    def pipeline(
+        self, transaction: bool = True, shard_hint: Optional[str] = None
+    ) -> InstrumentedPipeline:
+        return InstrumentedPipeline(
+            self.connection_pool, self.response_callbacks, transaction, shard_hint
+        )
 
 
 class RedisClient:
@@ -11,7 +41,7 @@ class RedisClient:
     @classmethod
     def get_client(cls) -> redis.Redis:
         if cls._instance is None:
-            cls._instance = redis.Redis(
+            cls._instance = InstrumentedRedis(
                 host=settings.redis_host,
                 port=settings.redis_port,
                 decode_responses=True,
@@ -19,17 +49,16 @@ class RedisClient:
                 password=settings.redis_password,
             )
 
-            # Initialize bloom filter
-            try:
-                cls._instance.bf().reserve(
-                    settings.redis_bloom_filter, errorRate=0.01, capacity=1000
-                )
-            except redis.exceptions.ResponseError as e:
-                if "exists" not in str(e).lower():
-                    raise
-
         return cls._instance
 
+    @classmethod
+    def close(cls) -> None:
+        """Close the client and disconnect every pooled connection."""
+        if cls._instance is not None:
+            cls._instance.close()
+            cls._instance.connection_pool.disconnect()
+            cls._instance = None
+
 
 def get_redis_client() -> redis.Redis:
     return RedisClient.get_client()
@@ -0,0 +1,90 @@
+import math
+from typing import List, Tuple
+
+_BASE32 = "0123456789bcdefghjkmnpqrstuvwxyz"
+# Mean Earth radius, as used by RediSearch ``geodistance``.
+EARTH_RADIUS_KM = 6372.797560856
+
+
+def encode(longitude: float, latitude: float, precision: int = 5) -> str:
+    """Encode a coordinate as a geohash of ``precision`` characters."""
+    lon_range = [-180.0, 180.0]
+    lat_range = [-90.0, 90.0]
+    chars = []
+    bits = 0
+    bit_count = 0
+    even = True
+
+    while len(chars) < precision:
+        if even:
+            mid = (lon_range[0] + lon_range[1]) / 2
+            if longitude >= mid:
+                bits = (bits << 1) | 1
+                lon_range[0] = mid
+            else:
+                bits <<= 1
+                lon_range[1] = mid
+        else:
+            mid = (lat_range[0] + lat_range[1]) / 2
+            if latitude >= mid:
+                bits = (bits << 1) | 1
+                lat_range[0] = mid
+            else:
+                bits <<= 1
+                lat_range[1] = mid
+        even = not even
+        bit_count += 1
+
+        if bit_count == 5:
+            chars.append(_BASE32[bits])
+            bits = 0
+            bit_count = 0
+
+    return "".join(chars)
+
+
+def _bounds(geohash: str) -> Tuple[List[float], List[float]]:
+    lon_range = [-180.0, 180.0]
+    lat_range = [-90.0, 90.0]
+    even = True
+
+    for char in geohash:
+        value = _BASE32.index(char)
+        for shift in range(4, -1, -1):
+            bit = (value >> shift) & 1
+            target = lon_range if even else lat_range
+            mid = (target[0] + target[1]) / 2
+            if bit:
+                target[0] = mid
+            else:
+                target[1] = mid
+            even = not even
+
+    return lon_range, lat_range
+
+
+def cell_center(geohash: str) -> Tuple[float, float]:
+    """Return the ``(longitude, latitude)`` centre of a geohash cell."""
+    lon_range, lat_range = _bounds(geohash)
+    return (lon_range[0] + lon_range[1]) / 2, (lat_range[0] + lat_range[1]) / 2
+
+
+def cell_radius_km(geohash: str) -> float:
+    """Distance from the centre of a geohash cell to its farthest corner."""
+    lon_range, lat_range = _bounds(geohash)
+    lon, lat = cell_center(geohash)
+    return max(
+        distance_km(lon, lat, corner_lon, corner_lat)
+        for corner_lon in lon_range
+        for corner_lat in lat_range
+    )
+
+
+def distance_km(lon1: float, lat1: float, lon2: float, lat2: float) -> float:
+    """Great-circle (haversine) distance between two coordinates."""
+    lon1, lat1, lon2, lat2 = map(math.radians, (lon1, lat1, lon2, lat2))
+    a = (
+        math.sin((lat2 - lat1) / 2) ** 2
+        + math.cos(lat1) * math.cos(lat2) * math.sin((lon2 - lon1) / 2) ** 2
+    )
+    return 2 * EARTH_RADIUS_KM * math.asin(math.sqrt(a))
@@ -0,0 +1,62 @@
+import hashlib
+from typing import Optional, Sequence
+
+from fastapi import Request, Response
+
+from ..config.settings import settings
+from .database import get_redis_client
+
+# Bumped by the indexer whenever it writes product documents.
+CATALOG_VERSION_KEY = "catalog_version"
+# Bumped by event ingestion whenever trending scores change.
+TRENDING_VERSION_KEY = "trending_version"
+
+
+def compute_etag(versions: Sequence[Optional[str]], *parts: str) -> str:
+    """Weak ETag over the data versions and whatever else shapes the response."""
+    material = "|".join(
+        [settings.app_version, *(version or "0" for version in versions), *parts]
+    )
+    return f'W/"{hashlib.sha1(material.encode("utf-8")).hexdigest()[:20]}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Weak comparison of ``etag`` against an ``If-None-Match`` header."""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    opaque = etag.removeprefix("W/")
+    return any(
+        candidate.strip().removeprefix("W/") == opaque
+        for candidate in if_none_match.split(",")
+    )
+
+
+def check_not_modified(
+    request: Request,
+    response: Response,
+    version_keys: Sequence[str],
+    cache_control: str,
+    *parts: str,
+) -> Optional[Response]:
+    """Set ``ETag``/``Cache-Control`` and return a 304 if the client is current.
+
+    Only the version counters are read, so a matching request never runs the
+    search or hydrates any products. ``parts`` distinguishes responses that
+    share the same versions, such as different request bodies.
+    """
+    versions = get_redis_client().mget(version_keys)
+    etag = compute_etag(versions, request.url.path, request.url.query, *parts)
+    headers = {"ETag": etag, "Cache-Control": cache_control}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+    response.headers.update(headers)
+    return None
+
+
+def drop_validators(response: Response) -> None:
+    """Undo ``check_not_modified`` for a response that must not be reused."""
+    if "etag" in response.headers:
+        del response.headers["etag"]
+    response.headers["Cache-Control"] = "no-store"
@@ -0,0 +1,447 @@
+import json
+import os
+import threading
+import time
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional
+
+import numpy as np
+import redis
+from prometheus_client import Gauge
+
+from ..config.settings import settings
+
+KEY_WIDTH = 64
+# Upper bound on the (queries x products) score block computed at once, so a
+# large query batch does not allocate a huge temporary matrix.
+MAX_SCORE_BLOCK = 1 << 25
+RELOAD_INTERVAL_SECONDS = 1.0
+MGET_CHUNK_SIZE = 500
+
+LOCAL_VECTORS_STALENESS = Gauge(
+    "pickperfect_local_vectors_staleness_seconds",
+    "Age of the oldest products_stream change not yet in the local vector snapshot.",
+    multiprocess_mode="mostrecent",
+)
+
+
+def _meta_path(path: str) -> str:
+    return os.path.join(path, "meta.json")
+
+
+def _matrix_path(path: str, generation: int) -> str:
+    return os.path.join(path, f"embeddings-{generation}.f32")
+
+
+def _keys_path(path: str, generation: int) -> str:
+    return os.path.join(path, f"keys-{generation}.bin")
+
+
+def _valid_path(path: str, generation: int) -> str:
+    return os.path.join(path, f"valid-{generation}.bin")
+
+
+def _normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return vectors / norms
+
+
+class LocalVectorIndex:
+    """Read-only, memory-mapped view of the product embedding matrix.
+
+    The matrix is written by ``jobs.sync_local_vectors``; every worker maps
+    the same files, so the pages are shared through the OS page cache. Rows
+    are L2-normalized, which makes the dot product the cosine similarity the
+    Redis index ranks by.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._generation: Optional[int] = None
+        self._meta_mtime: Optional[int] = None
+        self._checked = 0.0
+        self._matrix: Optional[np.ndarray] = None
+        self._keys: Optional[np.ndarray] = None
+        self._valid: Optional[np.ndarray] = None
+        self._count = 0
+        self._current_as_of: Optional[float] = None
+        self.dim = 0
+
+    def _refresh(self) -> None:
+        now = time.monotonic()
+        if now - self._checked < RELOAD_INTERVAL_SECONDS:
+            return
+        self._checked = now
+        try:
+            mtime = os.stat(_meta_path(self.path)).st_mtime_ns
+            if mtime == self._meta_mtime:
+                return
+            with open(_meta_path(self.path)) as f:
+                meta = json.load(f)
+        except (OSError, ValueError):
+            return
+
+        with self._lock:
+            if meta["generation"] != self._generation:
+                try:
+                    self._matrix = np.memmap(
+                        _matrix_path(self.path, meta["generation"]),
+                        dtype=np.float32,
+                        mode="r",
+                        shape=(meta["capacity"], meta["dim"]),
+                    )
+                    self._keys = np.memmap(
+                        _keys_path(self.path, meta["generation"]),
+                        dtype=f"S{KEY_WIDTH}",
+                        mode="r",
+                        shape=(meta["capacity"],),
+                    )
+                    self._valid = np.memmap(
+                        _valid_path(self.path, meta["generation"]),
+                        dtype=np.bool_,
+                        mode="r",
+                        shape=(meta["capacity"],),
+                    )
+                except OSError:
+                    # The writer replaced this generation after we read the
+                    # metadata; pick up the newer one on the next check.
+                    self._meta_mtime = None
+                    return
+                self._generation = meta["generation"]
+                self.dim = meta["dim"]
+            self._count = meta["count"]
+            self._current_as_of = meta.get("current_as_of")
+            self._meta_mtime = mtime
+
+    def search(self, queries: np.ndarray, k: int = 10) -> Optional[List[List[str]]]:
+        """Return the ``k`` nearest product keys for each query row.
+
+        Returns None when no snapshot is loaded or the query dimension does
+        not match, so callers can fall back to the Redis index.
+        """
+        self._refresh()
+        with self._lock:
+            matrix, keys, valid = self._matrix, self._keys, self._valid
+            count = self._count
+        queries = np.atleast_2d(np.asarray(queries, dtype=np.float32))
+        if not count or queries.shape[1] != self.dim:
+            return None
+
+        matrix = matrix[:count]
+        # Rows of removed products stay in place; cosine scores can be
+        # negative, so they must be pushed below every real match explicitly.
+        dead = np.flatnonzero(~valid[:count])
+        queries = _normalize(queries)
+        k = min(k, count)
+        block = max(1, MAX_SCORE_BLOCK // count)
+
+        results = []
+        for start in range(0, len(queries), block):
+            scores = queries[start : start + block] @ matrix.T
+            scores[:, dead] = -np.inf
+            top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+            top_scores = np.take_along_axis(scores, top, axis=1)
+            order = np.argsort(-top_scores, axis=1)
+            top = np.take_along_axis(top, order, axis=1)
+            top_scores = np.take_along_axis(top_scores, order, axis=1)
+            for row, row_scores in zip(top, top_scores):
+                results.append(
+                    [
+                        keys[i].decode("utf-8")
+                        for i, score in zip(row, row_scores)
+                        if score != -np.inf
+                    ]
+                )
+        return results
+
+    def staleness(self) -> Optional[float]:
+        """Seconds of stream changes the loaded snapshot may be missing.
+
+        Grows when the sync process is down or held back, e.g. by an entry
+        the indexer has not acknowledged yet.
+        """
+        self._refresh()
+        if self._current_as_of is None:
+            return None
+        staleness = max(0.0, time.time() - self._current_as_of)
+        LOCAL_VECTORS_STALENESS.set(staleness)
+        return staleness
+
+    def stats(self) -> Dict[str, Any]:
+        staleness = self.staleness()
+        return {
+            "enabled": True,
+            "loaded": self._generation is not None,
+            "generation": self._generation,
+            "count": self._count,
+            "dim": self.dim,
+            "staleness_seconds": staleness,
+        }
+
+
+class LocalVectorWriter:
+    """Builds the embedding matrix from ``product:*`` and tails ``products_stream``.
+
+    Stream entries are applied only once the indexer group has acknowledged
+    everything before them, so the embeddings they produced are already in
+    Redis. Progress is kept as the last-delivered ID of a dedicated consumer
+    group, which also stops the stream trimmer from removing entries that
+    have not been applied yet.
+    """
+
+    def __init__(self, path: str, redis_client: redis.Redis):
+        self.path = path
+        self.redis_client = redis_client
+        self.stream = settings.products_stream
+        self.indexer_group = settings.indexer_group
+        self.group = settings.local_vectors_group
+        self.meta: Dict[str, Any] = {}
+        self.matrix: Optional[np.ndarray] = None
+        self.keys: Optional[np.ndarray] = None
+        self.valid: Optional[np.ndarray] = None
+        self.rows: Dict[str, int] = {}
+        os.makedirs(path, exist_ok=True)
+
+    def open(self) -> bool:
+        """Open the existing matrix for updates; False when it must be rebuilt."""
+        try:
+            with open(_meta_path(self.path)) as f:
+                self.meta = json.load(f)
+        except (OSError, ValueError):
+            return False
+        if self._cursor() is None:
+            return False
+        if not os.path.exists(_valid_path(self.path, self.meta["generation"])):
+            # Snapshot written before rows carried a validity mask.
+            return False
+        self._map(self.meta["generation"], "r+")
+        self.rows = {
+            key.decode("utf-8"): row
+            for row, key in enumerate(self.keys[: self.meta["count"]])
+        }
+        return True
+
+    def _map(self, generation: int, mode: str) -> None:
+        capacity, dim = self.meta["capacity"], self.meta["dim"]
+        self.matrix = np.memmap(
+            _matrix_path(self.path, generation),
+            dtype=np.float32,
+            mode=mode,
+            shape=(capacity, dim),
+        )
+        self.keys = np.memmap(
+            _keys_path(self.path, generation),
+            dtype=f"S{KEY_WIDTH}",
+            mode=mode,
+            shape=(capacity,),
+        )
+        self.valid = np.memmap(
+            _valid_path(self.path, generation),
+            dtype=np.bool_,
+            mode=mode,
+            shape=(capacity,),
+        )
+
+    def _write_meta(self) -> None:
+        # Rows are flushed before the count that exposes them is published,
+        # and the rename makes the new metadata visible atomically.
+        self.matrix.flush()
+        self.keys.flush()
+        self.valid.flush()
+        tmp_path = f"{_meta_path(self.path)}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump(self.meta, f)
+        os.replace(tmp_path, _meta_path(self.path))
+
+    def _remove_generation(self, generation: int) -> None:
+        # Workers that still map the old files keep them alive until they
+        # remap, so unlinking them here is safe.
+        for path in (
+            _matrix_path(self.path, generation),
+            _keys_path(self.path, generation),
+            _valid_path(self.path, generation),
+        ):
+            if os.path.exists(path):
+                os.remove(path)
+
+    def _fetch_embeddings(self, keys: List[str]) -> Iterable[tuple]:
+        for start in range(0, len(keys), MGET_CHUNK_SIZE):
+            chunk = keys[start : start + MGET_CHUNK_SIZE]
+            for key, embedding in zip(
+                chunk, self.redis_client.json().mget(chunk, "$.embedding")
+            ):
+                yield key, embedding[0] if embedding else None
+
+    def _indexed_watermark(self) -> Optional[str]:
+        """ID of the first stream entry the indexer group has not acknowledged."""
+        try:
+            groups = self.redis_client.xinfo_groups(self.stream)
+        except redis.exceptions.ResponseError:
+            return None
+        for info in groups:
+            if info["name"] != self.indexer_group:
+                continue
+            pending = self.redis_client.xpending(self.stream, self.indexer_group)
+            if pending["pending"]:
+                return pending["min"]
+            ms, _, seq = info["last-delivered-id"].partition("-")
+            return f"{ms}-{int(seq or 0) + 1}"
+        return None
+
+    def _cursor(self) -> Optional[str]:
+        try:
+            groups = self.redis_client.xinfo_groups(self.stream)
+        except redis.exceptions.ResponseError:
+            return None
+        for info in groups:
+            if info["name"] == self.group:
+                return info["last-delivered-id"]
+        return None
+
+    def _set_cursor(self, entry_id: str) -> None:
+        try:
+            self.redis_client.xgroup_create(
+                self.stream, self.group, id=entry_id, mkstream=True
+            )
+        except redis.exceptions.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+            self.redis_client.xgroup_setid(self.stream, self.group, entry_id)
+
+    def build(self) -> int:
+        """Rebuild the matrix from every ``product:*`` document."""
+        # Entries the indexer has not finished yet are replayed by ``sync``
+        # after the build, so take the starting point before scanning.
+        watermark = self._indexed_watermark()
+        start_id = "0-0"
+        if watermark is not None:
+            last = self.redis_client.xrevrange(
+                self.stream, max=f"({watermark}", min="-", count=1
+            )
+            if last:
+                start_id = last[0][0]
+
+        keys = list(self.redis_client.scan_iter(match="product:*", count=1000))
+        vectors = []
+        found = []
+        for key, embedding in self._fetch_embeddings(keys):
+            if embedding and len(key) <= KEY_WIDTH:
+                vectors.append(embedding)
+                found.append(key)
+
+        if not vectors:
+            print("No product embeddings found, nothing to build")
+            return 0
+
+        old_generation = self.meta.get("generation")
+        self.meta = {
+            "generation": (old_generation or 0) + 1,
+            "dim": len(vectors[0]),
+            "capacity": max(1024, len(found) * 5 // 4),
+            "count": 0,
+        }
+        self._map(self.meta["generation"], "w+")
+        self.matrix[: len(found)] = _normalize(np.asarray(vectors, dtype=np.float32))
+        self.keys[: len(found)] = found
+        self.valid[: len(found)] = True
+        self.rows = {key: row for row, key in enumerate(found)}
+        self.meta["count"] = len(found)
+        self._write_meta()
+        self._set_cursor(start_id)
+        self._record_progress(start_id)
+        if old_generation is not None:
+            self._remove_generation(old_generation)
+        return len(found)
+
+    def _grow(self) -> None:
+        old_generation = self.meta["generation"]
+        old_matrix, old_keys, old_valid = self.matrix, self.keys, self.valid
+        count = self.meta["count"]
+        self.meta["generation"] = old_generation + 1
+        self.meta["capacity"] *= 2
+        self._map(self.meta["generation"], "w+")
+        self.matrix[:count] = old_matrix[:count]
+        self.keys[:count] = old_keys[:count]
+        self.valid[:count] = old_valid[:count]
+        self._write_meta()
+        self._remove_generation(old_generation)
+
+    def upsert(self, keys: List[str]) -> int:
+        """Refresh the rows for ``keys`` from Redis, appending new products."""
+        updated = 0
+        for key, embedding in self._fetch_embeddings(keys):
+            row = self.rows.get(key)
+            if embedding is None or len(embedding) != self.meta["dim"]:
+                if row is not None and self.valid[row]:
+                    # The product is gone or has no usable embedding; keep the
+                    # row but mask it out of every search.
+                    self.valid[row] = False
+                    updated += 1
+                continue
+            if row is None:
+                if len(key) > KEY_WIDTH:
+                    continue
+                if self.meta["count"] == self.meta["capacity"]:
+                    self._grow()
+                row = self.meta["count"]
+                self.keys[row] = key
+                self.rows[key] = row
+                self.meta["count"] += 1
+            self.matrix[row] = _normalize(np.asarray(embedding, dtype=np.float32))
+            self.valid[row] = True
+            updated += 1
+        if updated:
+            self._write_meta()
+        return updated
+
+    def sync(self, batch_size: int = 500) -> int:
+        """Apply stream entries the indexer has finished with; returns rows updated."""
+        watermark = self._indexed_watermark()
+        cursor = self._cursor()
+        if cursor is None:
+            return 0
+
+        updated = 0
+        while watermark is not None:
+            entries = self.redis_client.xrange(
+                self.stream, min=f"({cursor}", max=f"({watermark}", count=batch_size
+            )
+            if not entries:
+                break
+            keys = set()
+            for entry_id, data in entries:
+                message = data.get("product") or data.get("update")
+                try:
+                    keys.add(f"product:{json.loads(message)['id']}")
+                except (TypeError, ValueError, KeyError):
+                    # Dead-lettered by the indexer; there is nothing to apply.
+                    print(f"Skipping malformed stream entry {entry_id}")
+            updated += self.upsert(sorted(keys))
+            cursor = entries[-1][0]
+            self.redis_client.xgroup_setid(self.stream, self.group, cursor)
+
+        self._record_progress(cursor)
+        return updated
+
+    def _record_progress(self, cursor: str) -> None:
+        """Publish how current the snapshot is for workers to report."""
+        pending = self.redis_client.xrange(
+            self.stream, min=f"({cursor}", max="+", count=1
+        )
+        if pending:
+            # Everything from this entry on is missing from the snapshot.
+            ms, _, _ = pending[0][0].partition("-")
+            self.meta["current_as_of"] = int(ms) / 1000
+        else:
+            self.meta["current_as_of"] = time.time()
+        self._write_meta()
+
+
+@lru_cache
+def get_local_vector_index() -> Optional[LocalVectorIndex]:
+    """Return the per-process local vector index, or None when disabled."""
+    if not settings.local_vectors_enabled:
+        return None
+    return LocalVectorIndex(settings.local_vectors_path)
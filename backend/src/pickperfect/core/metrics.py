@@ -0,0 +1,145 @@
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+# Buckets tuned for the sub-millisecond Redis calls up to multi-second
+# embedding requests that make up a typical API call.
+LATENCY_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 250, 500)
+
+REQUEST_DURATION = Histogram(
+    "pickperfect_request_duration_seconds",
+    "End-to-end HTTP request latency.",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_STAGE_DURATION = Histogram(
+    "pickperfect_request_stage_duration_seconds",
+    "Total time a single request spent in a stage (redis, embedding, ...).",
+    ["route", "stage"],
+    buckets=LATENCY_BUCKETS,
+)
+REQUEST_STAGE_CALLS = Histogram(
+    "pickperfect_request_stage_calls",
+    "Number of calls a single request made into a stage.",
+    ["route", "stage"],
+    buckets=COUNT_BUCKETS,
+)
+REDIS_COMMAND_DURATION = Histogram(
+    "pickperfect_redis_command_duration_seconds",
+    "Latency of individual Redis commands and pipelines.",
+    ["command"],
+    buckets=LATENCY_BUCKETS,
+)
+EMBEDDING_REQUESTS = Counter(
+    "pickperfect_embedding_requests_total",
+    "Number of embedding API calls.",
+)
+
+
+class RequestTimings:
+    """Per-request call counts and accumulated durations, keyed by stage."""
+
+    def __init__(self) -> None:
+        self.start = time.perf_counter()
+        self.counts: Dict[str, int] = {}
+        self.durations: Dict[str, float] = {}
+
+    def add(self, stage: str, duration: float) -> None:
+        self.counts[stage] = self.counts.get(stage, 0) + 1
+        self.durations[stage] = self.durations.get(stage, 0.0) + duration
+
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.start
+
+    def server_timing(self) -> str:
+        """Render the timings as a ``Server-Timing`` header value."""
+        entries = [
+            f'{stage};dur={duration * 1000:.2f};desc="{self.counts[stage]} calls"'
+            for stage, duration in self.durations.items()
+        ]
+        entries.append(f"total;dur={self.elapsed() * 1000:.2f}")
+        return ", ".join(entries)
+
+
+_current_timings: ContextVar[Optional[RequestTimings]] = ContextVar(
+    "current_timings", default=None
+)
+
+
+def start_request() -> RequestTimings:
+    """Begin collecting timings for the current request context."""
+    timings = RequestTimings()
+    _current_timings.set(timings)
+    return timings
+
+
+def record(stage: str, duration: float) -> None:
+    """Attribute ``duration`` seconds of work to ``stage`` for the current request."""
+    timings = _current_timings.get()
+    if timings is not None:
+        timings.add(stage, duration)
+
+
+@contextmanager
+def timed(stage: str) -> Iterator[None]:
+    """Time the enclosed block and attribute it to ``stage``."""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record(stage, time.perf_counter() - start)
+
+
+def observe_redis_command(command: str, duration: float) -> None:
+    REDIS_COMMAND_DURATION.labels(command=command).observe(duration)
+    record("redis", duration)
+
+
+def observe_request(
+    timings: RequestTimings, method: str, route: str, status: int
+) -> None:
+    """Flush a finished request's timings into the Prometheus histograms."""
+    REQUEST_DURATION.labels(method=method, route=route, status=str(status)).observe(
+        timings.elapsed()
+    )
+    for stage, duration in timings.durations.items():
+        REQUEST_STAGE_DURATION.labels(route=route, stage=stage).observe(duration)
+        REQUEST_STAGE_CALLS.labels(route=route, stage=stage).observe(
+            timings.counts[stage]
+        )
+
+
+def render_metrics() -> bytes:
+    # With several workers each process writes its samples to
+    # PROMETHEUS_MULTIPROC_DIR and any worker can aggregate them on scrape.
+    if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest()
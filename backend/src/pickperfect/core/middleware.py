@@ -0,0 +1,129 @@
+import functools
+import inspect
+from typing import Any, Callable
+
+from fastapi import Response
+from fastapi.responses import JSONResponse
+from fastapi.routing import APIRoute, serialize_response
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from .metrics import observe_request, start_request, timed
+
+_RESPONSE_PARAM = "_timed_route_response"
+
+
+class TimingMiddleware:
+    """Collect per-request stage timings and expose them as ``Server-Timing``."""
+
+    def __init__(self, app: ASGIApp, server_timing: bool = True) -> None:
+        self.app = app
+        self.server_timing = server_timing
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings = start_request()
+        status_code = 500
+
+        async def send_wrapper(message: Message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+                if self.server_timing:
+                    headers = list(message.get("headers", []))
+                    headers.append(
+                        (b"server-timing", timings.server_timing().encode("latin-1"))
+                    )
+                    message["headers"] = headers
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Use the route template rather than the raw path to keep the
+            # label cardinality bounded.
+            route = scope.get("route")
+            route_path = getattr(route, "path", "unmatched")
+            observe_request(timings, scope["method"], route_path, status_code)
+
+
+class TimedJSONResponse(JSONResponse):
+    """JSON response that reports its rendering time as the ``serialize`` stage."""
+
+    def render(self, content: Any) -> bytes:
+        with timed("serialize"):
+            return super().render(content)
+
+
+class TimedRoute(APIRoute):
+    """Route that encodes and renders the endpoint result as one ``serialize`` stage.
+
+    FastAPI validates the result against the response model and runs
+    ``jsonable_encoder`` before ``Response.render`` is called, and that is
+    usually the bulk of the serialization cost. This route does the same
+    encoding and the rendering itself, timed, and hands FastAPI a finished
+    response.
+    """
+
+    def __init__(self, path: str, endpoint: Callable[..., Any], **kwargs: Any):
+        super().__init__(path, self._timed_endpoint(endpoint), **kwargs)
+
+    def _timed_endpoint(self, endpoint: Callable[..., Any]) -> Callable[..., Any]:
+        if not inspect.iscoroutinefunction(endpoint):
+            return endpoint
+
+        signature = inspect.signature(endpoint)
+        # FastAPI fills a single ``Response`` parameter per endpoint, so reuse
+        # the endpoint's own one if it declares it; headers it sets live there.
+        response_param = next(
+            (
+                name
+                for name, param in signature.parameters.items()
+                if inspect.isclass(param.annotation)
+                and issubclass(param.annotation, Response)
+            ),
+            None,
+        )
+        parameters = list(signature.parameters.values())
+        if response_param is None:
+            response_param = _RESPONSE_PARAM
+            parameters.append(
+                inspect.Parameter(
+                    response_param, inspect.Parameter.KEYWORD_ONLY, annotation=Response
+                )
+            )
+
+        @functools.wraps(endpoint)
+        async def wrapper(*args: Any, **kwargs: Any) -> Any:
+            if response_param == _RESPONSE_PARAM:
+                sub_response: Response = kwargs.pop(response_param)
+            else:
+                sub_response = kwargs[response_param]
+            content = await endpoint(*args, **kwargs)
+            if isinstance(content, Response):
+                return content
+
+            # A plain JSONResponse renders in its constructor, inside this
+            # block; TimedJSONResponse would count the stage a second time.
+            with timed("serialize"):
+                encoded = await serialize_response(
+                    field=self.response_field,
+                    response_content=content,
+                    include=self.response_model_include,
+                    exclude=self.response_model_exclude,
+                    by_alias=self.response_model_by_alias,
+                    exclude_unset=self.response_model_exclude_unset,
+                    exclude_defaults=self.response_model_exclude_defaults,
+                    exclude_none=self.response_model_exclude_none,
+                )
+                response = JSONResponse(
+                    encoded,
+                    status_code=sub_response.status_code or self.status_code or 200,
+                )
+            response.headers.raw.extend(sub_response.headers.raw)
+            return response
+
+        wrapper.__signature__ = signature.replace(parameters=parameters)
+        return wrapper
@@ -0,0 +1,195 @@
+import threading
+import time
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Any, Callable, Dict, List, Optional
+
+import redis
+from prometheus_client import Counter
+
+from ..config.settings import settings
+
+NEAR_CACHE_HITS = Counter(
+    "pickperfect_near_cache_hits_total", "Near cache lookups served locally."
+)
+NEAR_CACHE_MISSES = Counter(
+    "pickperfect_near_cache_misses_total", "Near cache lookups that went to Redis."
+)
+NEAR_CACHE_INVALIDATIONS = Counter(
+    "pickperfect_near_cache_invalidations_total",
+    "Entries dropped because Redis reported the key changed.",
+)
+NEAR_CACHE_EVICTIONS = Counter(
+    "pickperfect_near_cache_evictions_total", "Entries dropped by LRU eviction."
+)
+
+
+class NearCache:
+    """In-process LRU cache kept coherent with Redis client-side tracking.
+
+    A dedicated RESP3 connection enables ``CLIENT TRACKING`` in broadcast mode
+    for ``prefix``, so Redis pushes an invalidation message whenever any key
+    under the prefix is written, and a background thread evicts it at once.
+    While that connection is down the cache is bypassed and flushed.
+    """
+
+    def __init__(self, prefix: str, max_entries: int):
+        self.prefix = prefix
+        self.max_entries = max_entries
+        self.hits = 0
+        self.misses = 0
+        self.invalidations = 0
+        self.evictions = 0
+        self._entries: "OrderedDict[str, Any]" = OrderedDict()
+        # Keys being loaded from Redis; an invalidation that arrives while a
+        # load is in flight marks the key so the stale value is not stored.
+        self._loading: Dict[str, bool] = {}
+        self._lock = threading.Lock()
+        self._tracking = False
+        self._stop = threading.Event()
+        self._connection: Optional[redis.Connection] = None
+        self._thread = threading.Thread(
+            target=self._listen, name="near-cache-invalidations", daemon=True
+        )
+
+    def start(self) -> None:
+        self._thread.start()
+
+    def close(self) -> None:
+        self._stop.set()
+        self._thread.join(timeout=5)
+
+    def get_many(
+        self, keys: List[str], loader: Callable[[List[str]], List[Any]]
+    ) -> List[Any]:
+        """Return values for ``keys``, loading the misses with one ``loader`` call."""
+        if not self._tracking:
+            return loader(keys)
+
+        values: Dict[str, Any] = {}
+        missing = []
+        with self._lock:
+            for key in keys:
+                if key in self._entries:
+                    self._entries.move_to_end(key)
+                    values[key] = self._entries[key]
+                    self.hits += 1
+                    NEAR_CACHE_HITS.inc()
+                else:
+                    missing.append(key)
+                    self._loading.setdefault(key, False)
+                    self.misses += 1
+                    NEAR_CACHE_MISSES.inc()
+
+        if missing:
+            try:
+                loaded = loader(missing)
+            except Exception:
+                with self._lock:
+                    for key in missing:
+                        self._loading.pop(key, None)
+                raise
+
+            with self._lock:
+                for key, value in zip(missing, loaded):
+                    values[key] = value
+                    invalidated = self._loading.pop(key, True)
+                    if value is None or invalidated or not self._tracking:
+                        continue
+                    self._entries[key] = value
+                    self._entries.move_to_end(key)
+                    if len(self._entries) > self.max_entries:
+                        self._entries.popitem(last=False)
+                        self.evictions += 1
+                        NEAR_CACHE_EVICTIONS.inc()
+
+        return [values[key] for key in keys]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            size = len(self._entries)
+        return {
+            "enabled": self._tracking,
+            "size": size,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "invalidations": self.invalidations,
+            "evictions": self.evictions,
+        }
+
+    def _invalidate(self, keys: Optional[List[str]]) -> None:
+        with self._lock:
+            if keys is None:
+                # Sent on FLUSHALL/FLUSHDB: every key may have changed.
+                self.invalidations += len(self._entries)
+                NEAR_CACHE_INVALIDATIONS.inc(len(self._entries))
+                self._entries.clear()
+                for key in self._loading:
+                    self._loading[key] = True
+                return
+            for key in keys:
+                if isinstance(key, bytes):
+                    key = key.decode("utf-8")
+                if key in self._loading:
+                    self._loading[key] = True
+                if self._entries.pop(key, None) is not None:
+                    self.invalidations += 1
+                    NEAR_CACHE_INVALIDATIONS.inc()
+
+    def _on_push(self, message: List[Any]) -> None:
+        if message and message[0] in ("invalidate", b"invalidate"):
+            self._invalidate(message[1])
+
+    def _connect(self) -> redis.Connection:
+        connection = redis.Connection(
+            host=settings.redis_host,
+            port=settings.redis_port,
+            username=settings.redis_username,
+            password=settings.redis_password,
+            protocol=3,
+            decode_responses=True,
+        )
+        connection.connect()
+        connection._parser.set_invalidation_push_handler(self._on_push)
+        connection.send_command(
+            "CLIENT", "TRACKING", "ON", "BCAST", "PREFIX", self.prefix
+        )
+        connection.read_response()
+        return connection
+
+    def _listen(self) -> None:
+        while not self._stop.is_set():
+            try:
+                self._connection = self._connect()
+                self._tracking = True
+                last_ping = time.monotonic()
+                while not self._stop.is_set():
+                    if self._connection.can_read(timeout=1.0):
+                        self._connection.read_response(push_request=True)
+                    elif time.monotonic() - last_ping > 30:
+                        # Keep the otherwise idle connection from being reaped.
+                        self._connection.send_command("PING")
+                        last_ping = time.monotonic()
+            except Exception as e:
+                if not self._stop.is_set():
+                    print(f"Near cache tracking connection lost: {e}")
+            finally:
+                # Invalidations may have been missed, so nothing cached so far
+                # can be trusted once the connection is gone.
+                self._tracking = False
+                self._invalidate(None)
+                if self._connection is not None:
+                    self._connection.disconnect()
+                    self._connection = None
+            self._stop.wait(1.0)
+
+
+@lru_cache
+def get_product_cache() -> Optional[NearCache]:
+    """Return the per-process product near cache, or None when disabled."""
+    if not settings.near_cache_enabled:
+        return None
+    cache = NearCache("product:", settings.near_cache_max_entries)
+    cache.start()
+    return cache
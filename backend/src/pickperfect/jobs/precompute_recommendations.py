@@ -0,0 +1,141 @@
+import argparse
+import json
+import time
+from typing import Dict, List
+
+import numpy as np
+
+from ..config.settings import settings
+from ..core.database import RedisClient, get_redis_client
+from ..services.query_profiler import get_query_profiler
+from ..services.recommendation_service import (
+    CANDIDATE_LIMIT,
+    get_recommendation_service,
+)
+
+DEFAULT_BATCH_SIZE = 200
+EVENT_HISTORY = 100
+
+
+class PrecomputeStats:
+    def __init__(self):
+        self.scanned = 0
+        self.active = 0
+        self.computed = 0
+        self.skipped = 0
+        self.started = time.monotonic()
+
+    def report(self) -> str:
+        elapsed = time.monotonic() - self.started
+        rate = self.computed / elapsed if elapsed else 0.0
+        coverage = 100.0 * self.computed / self.active if self.active else 0.0
+        return (
+            f"scanned={self.scanned} active={self.active} computed={self.computed} "
+            f"skipped={self.skipped} coverage={coverage:.1f}% "
+            f"elapsed={elapsed:.1f}s ({rate:.0f} users/sec)"
+        )
+
+
+def precompute_batch(emails: List[str], active_since: float, stats: PrecomputeStats):
+    """Compute and store recommendations for one batch of users."""
+    redis_client = get_redis_client()
+    recommendation_service = get_recommendation_service()
+    product_service = recommendation_service.product_service
+
+    pipe = redis_client.pipeline(transaction=False)
+    for email in emails:
+        pipe.lrange(f"user_events:{email}", 0, EVENT_HISTORY)
+
+    user_scores: Dict[str, Dict[str, float]] = {}
+    for email, events in zip(emails, pipe.execute()):
+        if not events:
+            continue
+        # Events are LPUSHed, so the first one is the most recent.
+        if json.loads(events[0])["timestamp"] < active_since:
+            continue
+        stats.active += 1
+        user_scores[email] = recommendation_service.score_events(events)
+
+    product_ids = sorted({pid for scores in user_scores.values() for pid in scores})
+    embeddings = {}
+    if product_ids:
+        keys = [f"product:{product_id}" for product_id in product_ids]
+        for product_id, embedding in zip(
+            product_ids, redis_client.json().mget(keys, "$.embedding")
+        ):
+            if embedding:
+                embeddings[product_id] = embedding[0]
+
+    users = []
+    vectors = []
+    for email, scores in user_scores.items():
+        vector = recommendation_service.preference_vector(scores, embeddings)
+        if vector is None:
+            stats.skipped += 1
+            continue
+        users.append(email)
+        vectors.append(vector)
+
+    if not users:
+        return
+
+    results = product_service.vector_search_ids_batch(
+        np.vstack(vectors), CANDIDATE_LIMIT
+    )
+
+    pipe = redis_client.pipeline(transaction=False)
+    for email, keys in zip(users, results):
+        scores = user_scores[email]
+        product_ids = [key.split(":", 1)[1] for key in keys]
+        ranked = [pid for pid in product_ids if pid not in scores]
+        # Keep the spare candidates: the serving path drops products the user
+        # interacts with before the entry expires and needs something left.
+        pipe.set(
+            f"recommendations:{email}",
+            json.dumps(ranked),
+            ex=settings.recommendation_precompute_ttl_seconds,
+        )
+    pipe.execute()
+    stats.computed += len(users)
+
+
+def run(batch_size: int, active_hours: float) -> PrecomputeStats:
+    """Precompute recommendations for every user active in the last ``active_hours``."""
+    redis_client = get_redis_client()
+    active_since = time.time() - active_hours * 3600
+    stats = PrecomputeStats()
+
+    batch = []
+    for key in redis_client.scan_iter(match="user_events:*", count=1000):
+        stats.scanned += 1
+        batch.append(key.split(":", 1)[1])
+        if len(batch) >= batch_size:
+            precompute_batch(batch, active_since, stats)
+            batch = []
+            print(f"🧮 {stats.report()}")
+    if batch:
+        precompute_batch(batch, active_since, stats)
+
+    return stats
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Precompute personalized recommendations for recently active users."
+    )
+    parser.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_SIZE)
+    parser.add_argument(
+        "--active-hours",
+        type=float,
+        default=settings.recommendation_active_hours,
+        help="Only users with an event in this many hours are precomputed.",
+    )
+    args = parser.parse_args()
+
+    try:
+        stats = run(args.batch_size, args.active_hours)
+        print(f"✅ Precomputed recommendations: {stats.report()}")
+    finally:
+        # Let the profiler finish logging the job's KNN queries.
+        get_query_profiler().close()
+        RedisClient.close()
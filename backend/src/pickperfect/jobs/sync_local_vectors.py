@@ -0,0 +1,55 @@
+import argparse
+import time
+
+from ..config.settings import settings
+from ..core.database import RedisClient, get_redis_client
+from ..core.local_vectors import LocalVectorWriter
+
+DEFAULT_INTERVAL_SECONDS = 1.0
+
+
+def build(writer: LocalVectorWriter) -> None:
+    started = time.monotonic()
+    count = writer.build()
+    elapsed = time.monotonic() - started
+    rate = count / elapsed if elapsed else 0.0
+    print(
+        f"🧱 Built generation {writer.meta.get('generation')} with {count} products "
+        f"in {elapsed:.1f}s ({rate:.0f} products/sec)"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(
+        description="Build the local vector engine matrix and keep it in sync "
+        "with the products stream."
+    )
+    parser.add_argument("--path", default=settings.local_vectors_path)
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL_SECONDS)
+    parser.add_argument(
+        "--rebuild", action="store_true", help="Rebuild from product:* documents."
+    )
+    parser.add_argument(
+        "--once", action="store_true", help="Build or sync once and exit."
+    )
+    args = parser.parse_args()
+
+    writer = LocalVectorWriter(args.path, get_redis_client())
+    try:
+        if args.rebuild or not writer.open():
+            build(writer)
+        while True:
+            if writer.matrix is not None:
+                updated = writer.sync()
+                if updated:
+                    print(
+                        f"🔄 Updated {updated} rows ({writer.meta['count']} products)"
+                    )
+            if args.once:
+                break
+            time.sleep(args.interval)
+            if writer.matrix is None:
+                # Nothing had been indexed at the last build; try again.
+                build(writer)
+    finally:
+        RedisClient.close()
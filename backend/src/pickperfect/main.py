@@ -1,13 +1,59 @@
-from fastapi import FastAPI
+from contextlib import asynccontextmanager
+
+from fastapi import FastAPI, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from prometheus_client import CONTENT_TYPE_LATEST
 
 from .api.v1 import api_router
 from .config.settings import settings
-from .core.database import get_redis_client
+from .core.database import RedisClient, get_redis_client
+from .core.local_vectors import get_local_vector_index
+from .core.metrics import render_metrics
+from .core.middleware import TimedJSONResponse, TimingMiddleware
+from .core.near_cache import get_product_cache
+from .services.embedding_service import get_embedding_service
+from .services.product_service import get_product_service
+from .services.query_profiler import get_query_profiler
+from .services.recommendation_service import get_recommendation_service
+from .services.user_service import get_user_service
+
+SERVICE_GETTERS = (
+    get_product_cache,
+    get_local_vector_index,
+    get_embedding_service,
+    get_query_profiler,
+    get_product_service,
+    get_recommendation_service,
+    get_user_service,
+)
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Services are built per process on startup rather than at import time,
+    # so each worker opens its own Redis pool and OpenAI client. Endpoints
+    # read them from app.state through the async dependencies in api.deps.
+    app.state.product_cache = get_product_cache()
+    app.state.local_vector_index = get_local_vector_index()
+    app.state.query_profiler = get_query_profiler()
+    app.state.product_service = get_product_service()
+    app.state.recommendation_service = get_recommendation_service()
+    app.state.user_service = get_user_service()
+    yield
+    app.state.query_profiler.close()
+    get_embedding_service().close()
+    if app.state.product_cache is not None:
+        app.state.product_cache.close()
+    RedisClient.close()
+    for getter in SERVICE_GETTERS:
+        getter.cache_clear()
+
 
 app = FastAPI(
     title=settings.app_title,
     version=settings.app_version,
+    default_response_class=TimedJSONResponse,
+    lifespan=lifespan,
 )
 
 app.add_middleware(
@@ -18,6 +64,9 @@ app.add_middleware(
     allow_headers=settings.cors_allow_headers,
 )
 
+if settings.metrics_enabled:
+    app.add_middleware(TimingMiddleware, server_timing=settings.server_timing_enabled)
+
 app.include_router(api_router)
 
 
@@ -32,7 +81,19 @@ async def health_check():
         return {"status": "unhealthy", "redis": "disconnected", "error": str(e)}
 
 
+@app.get("/metrics", include_in_schema=False)
+async def metrics(request: Request):
+    """Prometheus metrics endpoint."""
+    local_vectors = request.app.state.local_vector_index
+    if local_vectors is not None:
+        # Staleness keeps growing while the sync is stuck, so sample it on
+        # every scrape rather than only when a search happens.
+        local_vectors.staleness()
+    return Response(content=render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+
 if __name__ == "__main__":
     import uvicorn
 
+    # Development runner; use ``pickperfect.server`` for production.
     uvicorn.run("src.pickperfect.main:app", host="0.0.0.0", port=8000, reload=True)
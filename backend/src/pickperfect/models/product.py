@@ -18,6 +18,10 @@ class Product(BaseModel):
     features: List[str]
 
 
+class NearbyProduct(Product):
+    distance_km: float
+
+
 class ProductSearch(BaseModel):
     query: Optional[str] = None
 
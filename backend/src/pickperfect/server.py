@@ -0,0 +1,181 @@
+import argparse
+import json
+import os
+import signal
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from typing import Dict
+
+import uvicorn
+
+APP_MODULE = f"{__package__}.main"
+
+STARTUP_BENCHMARK = """
+import asyncio, json, time
+start = time.perf_counter()
+from {module} import app
+imported = time.perf_counter()
+
+async def startup():
+    async with app.router.lifespan_context(app):
+        return time.perf_counter()
+
+ready = asyncio.run(startup())
+print(json.dumps({{"import_s": imported - start, "startup_s": ready - imported}}))
+"""
+
+
+class Launcher:
+    """Pre-forking supervisor that runs several uvicorn workers on one socket.
+
+    The application module is imported once in the master so workers fork
+    with it already loaded; services are still built per worker by the
+    FastAPI lifespan.
+    """
+
+    def __init__(self, config: uvicorn.Config, workers: int, graceful_timeout: int):
+        self.config = config
+        self.workers = workers
+        self.graceful_timeout = graceful_timeout
+        self.children: Dict[int, int] = {}
+        self.should_exit = False
+
+    def run(self) -> None:
+        sock = self.config.bind_socket()
+        self.config.load()
+
+        signal.signal(signal.SIGTERM, self._handle_exit)
+        signal.signal(signal.SIGINT, self._handle_exit)
+
+        for slot in range(self.workers):
+            self._spawn(slot, sock)
+        print(
+            f"Started {self.workers} workers on {self.config.host}:{self.config.port}"
+        )
+
+        while not self.should_exit:
+            try:
+                pid, status = os.waitpid(-1, os.WNOHANG)
+            except ChildProcessError:
+                break
+            if pid == 0:
+                time.sleep(0.5)
+                continue
+            slot = self.children.pop(pid, None)
+            self._mark_dead(pid)
+            if slot is not None and not self.should_exit:
+                print(f"Worker {pid} exited with status {status}, restarting")
+                self._spawn(slot, sock)
+
+        self._shutdown()
+        sock.close()
+
+    def _spawn(self, slot: int, sock) -> None:
+        pid = os.fork()
+        if pid == 0:
+            signal.signal(signal.SIGTERM, signal.SIG_DFL)
+            signal.signal(signal.SIGINT, signal.SIG_DFL)
+            server = uvicorn.Server(self.config)
+            server.run(sockets=[sock])
+            os._exit(0)
+        self.children[pid] = slot
+
+    def _handle_exit(self, signum, frame) -> None:
+        self.should_exit = True
+
+    def _shutdown(self) -> None:
+        # SIGTERM makes uvicorn stop accepting, drain in-flight requests and
+        # run the lifespan shutdown that closes the Redis and OpenAI pools.
+        for pid in self.children:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+        deadline = time.monotonic() + self.graceful_timeout + 5
+        while self.children and time.monotonic() < deadline:
+            for pid in list(self.children):
+                done, _ = os.waitpid(pid, os.WNOHANG)
+                if done:
+                    self.children.pop(pid)
+                    self._mark_dead(pid)
+            time.sleep(0.1)
+
+        for pid in self.children:
+            print(f"Worker {pid} did not stop in time, killing it")
+            os.kill(pid, signal.SIGKILL)
+            os.waitpid(pid, 0)
+            self._mark_dead(pid)
+
+    def _mark_dead(self, pid: int) -> None:
+        if "PROMETHEUS_MULTIPROC_DIR" in os.environ:
+            from prometheus_client import multiprocess
+
+            multiprocess.mark_process_dead(pid)
+
+
+def benchmark_startup(runs: int) -> None:
+    """Measure cold import and lifespan startup time in fresh interpreters."""
+    code = STARTUP_BENCHMARK.format(module=APP_MODULE)
+    import_times = []
+    startup_times = []
+    for _ in range(runs):
+        result = subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True
+        )
+        if result.returncode != 0:
+            error = result.stderr.strip().splitlines() or ["unknown error"]
+            print(f"Startup failed: {error[-1]}")
+            return
+        timings = json.loads(result.stdout.strip().splitlines()[-1])
+        import_times.append(timings["import_s"] * 1000)
+        startup_times.append(timings["startup_s"] * 1000)
+
+    for label, samples in (("import", import_times), ("startup", startup_times)):
+        print(
+            f"{label:8s} median {statistics.median(samples):8.1f} ms  "
+            f"min {min(samples):8.1f} ms  max {max(samples):8.1f} ms"
+        )
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Run the PickPerfect API server.")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 1)
+    parser.add_argument("--graceful-timeout", type=int, default=30)
+    parser.add_argument(
+        "--benchmark-startup",
+        type=int,
+        metavar="RUNS",
+        help="Measure import and startup time over RUNS fresh processes and exit.",
+    )
+    args = parser.parse_args()
+
+    if args.benchmark_startup:
+        benchmark_startup(args.benchmark_startup)
+        return
+
+    if args.workers > 1 and "PROMETHEUS_MULTIPROC_DIR" not in os.environ:
+        # Must be set before prometheus_client is imported by the app.
+        os.environ["PROMETHEUS_MULTIPROC_DIR"] = tempfile.mkdtemp(
+            prefix="pickperfect-metrics-"
+        )
+
+    config = uvicorn.Config(
+        f"{APP_MODULE}:app",
+        host=args.host,
+        port=args.port,
+        timeout_graceful_shutdown=args.graceful_timeout,
+    )
+    if args.workers == 1:
+        uvicorn.Server(config).run()
+    else:
+        Launcher(config, args.workers, args.graceful_timeout).run()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,20 +1,29 @@
+from functools import lru_cache
 from typing import List
 
 from openai import OpenAI
 
 from ..config.settings import settings
+from ..core.metrics import EMBEDDING_REQUESTS, timed
 
 
 class EmbeddingService:
     def __init__(self):
         self.client = OpenAI(api_key=settings.openai_api_key)
 
+    def close(self) -> None:
+        self.client.close()
+
     def get_embedding(self, text: str) -> List[float]:
         """Get OpenAI embedding for text."""
-        response = self.client.embeddings.create(
-            model="text-embedding-3-small", input=text
-        )
+        EMBEDDING_REQUESTS.inc()
+        with timed("embedding"):
+            response = self.client.embeddings.create(
+                model="text-embedding-3-small", input=text
+            )
         return response.data[0].embedding
 
 
-embedding_service = EmbeddingService()
+@lru_cache
+def get_embedding_service() -> EmbeddingService:
+    return EmbeddingService()
@@ -1,33 +1,99 @@
-from typing import List, Optional, Tuple
+import json
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple, Union
 
 import numpy as np
+from redis.commands.search.aggregation import AggregateRequest, Asc
 from redis.commands.search.query import Query
 
 from ..config.settings import settings
+from ..core import geohash
 from ..core.database import get_redis_client
-from ..models.product import FilterRequest, Product
-from .embedding_service import embedding_service
+from ..core.local_vectors import get_local_vector_index
+from ..core.metrics import timed
+from ..core.near_cache import get_product_cache
+from ..models.product import FilterRequest, NearbyProduct, Product
+from .embedding_service import get_embedding_service
+from .query_profiler import get_query_profiler
+
+# Candidates fetched per requested result, so re-ranking from the caller's
+# position within the cell still finds the truly nearest products.
+NEARBY_CANDIDATE_FACTOR = 4
 
 
 class ProductService:
     def __init__(self):
         self.redis_client = get_redis_client()
+        self.embedding_service = get_embedding_service()
+        self.query_profiler = get_query_profiler()
+        self.product_cache = get_product_cache()
+        self.local_vectors = get_local_vector_index()
+
+    def _search(
+        self,
+        query: Union[Query, AggregateRequest],
+        query_params: Optional[Dict[str, Any]] = None,
+    ):
+        """Run a search or aggregation and report it to the slow-query profiler."""
+        index = self.redis_client.ft(settings.search_index_name)
+        start = time.perf_counter()
+        try:
+            if isinstance(query, AggregateRequest):
+                result = index.aggregate(query, query_params=query_params)
+            else:
+                result = index.search(query, query_params=query_params)
+        except Exception as e:
+            duration_ms = (time.perf_counter() - start) * 1000
+            self.query_profiler.observe(query, query_params, duration_ms, error=str(e))
+            raise
+        self.query_profiler.observe(
+            query, query_params, (time.perf_counter() - start) * 1000
+        )
+        return result
+
+    def _load_documents(self, keys: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Fetch product documents from Redis without their embeddings."""
+        if not keys:
+            return []
+        documents = []
+        for docs in self.redis_client.json().mget(keys, "$"):
+            if not docs:
+                documents.append(None)
+                continue
+            data = docs[0]
+            data.pop("embedding", None)
+            documents.append(data)
+        return documents
+
+    def get_documents(self, keys: List[str]) -> List[Optional[Dict[str, Any]]]:
+        """Get product documents, served from the near cache when enabled.
+
+        Returned dicts may be shared with the cache and must not be mutated.
+        """
+        if self.product_cache is None:
+            return self._load_documents(keys)
+        return self.product_cache.get_many(keys, self._load_documents)
 
     def get_all_products(self) -> List[Product]:
         """Get all products from Redis."""
         prefix = "product:"
-        results = []
-        for key in self.redis_client.scan_iter(match=f"{prefix}*"):
-            data = self.redis_client.json().get(key)
-            if "embedding" in data:
-                del data["embedding"]
-            if "warehouse_geolocation" in data:
-                del data["warehouse_geolocation"]
-            results.append(Product(**data))
-        return results
+        keys = list(self.redis_client.scan_iter(match=f"{prefix}*"))
+        return [Product(**data) for data in self.get_documents(keys) if data]
+
+    def _local_knn(self, embeddings: np.ndarray, k: int) -> Optional[List[List[str]]]:
+        """KNN over the local vector engine, or None to fall back to Redis."""
+        if self.local_vectors is None:
+            return None
+        with timed("numpy"):
+            return self.local_vectors.search(embeddings, k)
 
     def vector_search_embed(self, embedding: List[float], k: int = 10) -> List[Product]:
         """Search products using vector similarity."""
+        local = self._local_knn(embedding, k)
+        if local is not None:
+            return [Product(**data) for data in self.get_documents(local[0]) if data]
+
         vector_bytes = np.array(embedding).astype(np.float32).tobytes()
         base_query = f"*=>[KNN {k} @embedding $vec AS vector_score]"
         query = (
@@ -39,21 +105,58 @@ class ProductService:
 
         params_dict = {"vec": vector_bytes}
 
-        results = self.redis_client.ft(settings.search_index_name).search(
-            query, query_params=params_dict
-        )
+        results = self._search(query, params_dict)
+
+        keys = [getattr(doc, "id") for doc in results.docs]
+        return [Product(**data) for data in self.get_documents(keys) if data]
+
+    def vector_search_ids_batch(
+        self, embeddings: np.ndarray, k: int = 10
+    ) -> List[List[str]]:
+        """Run one KNN query per row of ``embeddings`` in a single round trip.
 
-        filtered_products = []
-        for doc in results.docs:
-            data = self.redis_client.json().get(getattr(doc, "id"))
-            if "embedding" in data:
-                del data["embedding"]
-            filtered_products.append(Product(**data))
-        return filtered_products
+        Returns the matching product keys for each row, nearest first.
+        """
+        local = self._local_knn(embeddings, k)
+        if local is not None:
+            return local
+
+        query = (
+            Query(f"*=>[KNN {k} @embedding $vec AS vector_score]")
+            .sort_by("vector_score")
+            .no_content()
+            .paging(0, k)
+            .dialect(2)
+        )
+        vectors = [np.asarray(row, dtype=np.float32).tobytes() for row in embeddings]
+        pipe = self.redis_client.pipeline(transaction=False)
+        for vector in vectors:
+            pipe.execute_command(
+                "FT.SEARCH",
+                settings.search_index_name,
+                *query.get_args(),
+                "PARAMS",
+                2,
+                "vec",
+                vector,
+            )
+        start = time.perf_counter()
+        replies = pipe.execute(raise_on_error=False)
+        # Pipelined replies arrive together, so each query is reported to the
+        # slow-query profiler with an equal share of the round trip.
+        duration_ms = (time.perf_counter() - start) * 1000 / max(1, len(vectors))
+        for vector, reply in zip(vectors, replies):
+            error = str(reply) if isinstance(reply, Exception) else None
+            self.query_profiler.observe(query, {"vec": vector}, duration_ms, error)
+        for reply in replies:
+            if isinstance(reply, Exception):
+                raise reply
+        # A NOCONTENT reply is the total count followed by the matching keys.
+        return [list(reply[1:]) for reply in replies]
 
     def vector_search(self, query: str, k: int = 10) -> List[Product]:
         """Search products using text query converted to embeddings."""
-        query_embedding = embedding_service.get_embedding(query)
+        query_embedding = self.embedding_service.get_embedding(query)
         return self.vector_search_embed(query_embedding, k)
 
     def multi_parameter_search(
@@ -97,39 +200,104 @@ class ProductService:
             query_parts.append(f"@warehouse_location:[{lon} {lat} {geo_radius_km} km]")
 
         base_query = " ".join(query_parts) if query_parts else "*"
-        
+
         query = Query(base_query).return_fields("id").dialect(2)
         query = query.paging(0, 20)
 
+        # Errors propagate so that callers can tell "no matches" from a
+        # failed search, which must not be cached.
+        result = self._search(query, query_params)
+        keys = [getattr(doc, "id") for doc in result.docs]
+        return [Product(**data) for data in self.get_documents(keys) if data]
+
+    def search_nearby(
+        self,
+        longitude: float,
+        latitude: float,
+        radius_km: Optional[float] = None,
+        limit: int = 20,
+    ) -> List[NearbyProduct]:
+        """Search products near a location, sorted by distance."""
+        radius_km = min(
+            radius_km or settings.geo_search_radius_km, settings.geo_max_radius_km
+        )
+        limit = min(limit, settings.geo_max_limit)
+        # Snap to the geohash cell so users in the same neighbourhood share
+        # one cached candidate set.
+        cell = geohash.encode(longitude, latitude, settings.geo_cell_precision)
+        candidates = self._nearby_candidates(cell, radius_km, limit)
+
+        # Candidates are ranked from the cell centre; distances and ordering
+        # are recomputed from the caller's own position.
+        nearby = []
+        for candidate in candidates:
+            lon, lat = candidate["location"]
+            distance = geohash.distance_km(longitude, latitude, lon, lat)
+            if distance <= radius_km:
+                nearby.append((distance, candidate["product"]))
+        nearby.sort(key=lambda item: item[0])
+
+        return [
+            NearbyProduct(**data, distance_km=round(distance, 3))
+            for distance, data in nearby[:limit]
+        ]
+
+    def _nearby_candidates(
+        self, cell: str, radius_km: float, limit: int
+    ) -> List[Dict[str, Any]]:
+        """Products around a geohash cell with their coordinates, cached per cell."""
+        cache_key = f"geo_nearby:{cell}:{radius_km:g}:{limit}"
+        cached = self.redis_client.get(cache_key)
+        if cached is not None:
+            return json.loads(cached)
+
+        # Widen the radius by the cell size so callers near the edge of the
+        # cell still see everything within ``radius_km`` of themselves, and
+        # over-fetch so re-ranking from their position has enough to pick from.
+        lon, lat = geohash.cell_center(cell)
+        search_radius = radius_km + geohash.cell_radius_km(cell)
+        candidate_limit = limit * NEARBY_CANDIDATE_FACTOR
+        request = (
+            AggregateRequest("@warehouse_location:[$lon $lat $radius km]")
+            .load("@__key", "@warehouse_location")
+            .apply(dist=f"geodistance(@warehouse_location, {lon}, {lat})")
+            .sort_by(Asc("@dist"), max=candidate_limit)
+            .limit(0, candidate_limit)
+            .dialect(2)
+        )
+        query_params = {"lon": lon, "lat": lat, "radius": search_radius}
+
         try:
-            result = self.redis_client.ft(settings.search_index_name).search(
-                query, query_params=query_params
-            )
-            filtered_products = []
-            for doc in result.docs:
-                data = self.redis_client.json().get(getattr(doc, "id"))
-                if "embedding" in data:
-                    del data["embedding"]
-                filtered_products.append(Product(**data))
-            return filtered_products
+            result = self._search(request, query_params)
         except Exception as e:
-            print(f"Multi-parameter search error: {e}")
+            print(f"Near-by search error: {e}")
             return []
 
+        locations = {}
+        for row in result.rows:
+            fields = dict(zip(row[::2], row[1::2]))
+            locations[fields["__key"]] = [
+                float(value) for value in fields["warehouse_location"].split(",")
+            ]
+
+        candidates = []
+        keys = list(locations)
+        for key, data in zip(keys, self.get_documents(keys)):
+            if data:
+                product = Product(**data).model_dump()
+                candidates.append({"product": product, "location": locations[key]})
+
+        self.redis_client.setex(
+            cache_key, settings.geo_cache_ttl_seconds, json.dumps(candidates)
+        )
+        return candidates
+
     def get_trending_products(self, limit: int = 10) -> List[Product]:
         """Get trending products based on interaction scores."""
         trending_ids = self.redis_client.zrevrange("trending_products", 0, limit - 1)
 
-        results = []
-        for product_id in trending_ids:
-            data = self.redis_client.json().get(f"product:{product_id}")
-            if "embedding" in data:
-                del data["embedding"]
-            if "warehouse_geolocation" in data:
-                del data["warehouse_geolocation"]
-            results.append(Product(**data))
-
-        return results
+        keys = [f"product:{product_id}" for product_id in trending_ids]
+        return [Product(**data) for data in self.get_documents(keys) if data]
 
     def filter_products(self, filter_request: FilterRequest) -> List[Product]:
         """Filter products based on filter criteria."""
@@ -150,4 +318,6 @@ class ProductService:
         )
 
 
-product_service = ProductService()
+@lru_cache
+def get_product_service() -> ProductService:
+    return ProductService()
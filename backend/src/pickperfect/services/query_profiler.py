@@ -0,0 +1,280 @@
+import argparse
+import json
+import random
+import re
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Union
+
+from prometheus_client import Counter
+from redis.commands.search.aggregation import AggregateRequest
+from redis.commands.search.query import Query
+
+from ..config.settings import settings
+from ..core.database import get_redis_client
+
+PROFILES_DROPPED = Counter(
+    "pickperfect_query_profiles_dropped_total",
+    "Logged searches whose FT.PROFILE re-run was skipped to protect Redis.",
+    ["reason"],
+)
+
+# Literal values are replaced so that queries differing only in their
+# arguments collapse onto the same shape.
+_SHAPE_PATTERNS = [
+    (re.compile(r"(@\w+):\[[^\]]*\]"), r"\1:[?]"),
+    (re.compile(r"(@\w+):\{[^}]*\}"), r"\1:{?}"),
+    (re.compile(r"(@[\w|@]+):[^\s()\[{]+"), r"\1:?"),
+    (re.compile(r"KNN \d+"), "KNN ?"),
+    (re.compile(r"geodistance\(([^,]+),[^)]*\)"), r"geodistance(\1, ?, ?)"),
+    (re.compile(r"\b(MAX|LIMIT \d+) \d+"), r"\1 ?"),
+]
+
+
+# Near-by searches carry the caller's position, snapped to a geohash cell
+# (about 5 km). Coordinates are redacted before anything is logged, since the
+# log is readable by operators who have no business knowing where users are.
+_COORDINATE_PARAMS = frozenset({"lon", "lat"})
+_NUMBER = r"-?\d[\d.eE+-]*"
+_COORDINATE_PATTERNS = [
+    (
+        re.compile(rf"geodistance\(([^,]+),\s*{_NUMBER}\s*,\s*{_NUMBER}\s*\)"),
+        r"geodistance(\1, ?, ?)",
+    ),
+    (
+        re.compile(rf"\[\s*{_NUMBER}\s+{_NUMBER}\s+(\S+\s+(?:m|km|mi|ft))\s*\]"),
+        r"[? ? \1]",
+    ),
+]
+
+
+def redact_coordinates(query_string: str) -> str:
+    """Replace literal longitudes and latitudes in a query string with ``?``."""
+    for pattern, replacement in _COORDINATE_PATTERNS:
+        query_string = pattern.sub(replacement, query_string)
+    return query_string
+
+
+def query_shape(query_string: str) -> str:
+    """Normalize a search query string by stripping literal values."""
+    shape = query_string
+    for pattern, replacement in _SHAPE_PATTERNS:
+        shape = pattern.sub(replacement, shape)
+    return shape
+
+
+def _query_text(query: Union[Query, AggregateRequest]) -> str:
+    if isinstance(query, AggregateRequest):
+        text = " ".join(str(arg) for arg in query.build_args())
+    else:
+        text = query.query_string()
+    return redact_coordinates(text)
+
+
+def _describe_params(query_params: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    described = {}
+    for name, value in (query_params or {}).items():
+        if name in _COORDINATE_PARAMS:
+            described[name] = "?"
+        elif isinstance(value, bytes):
+            described[name] = f"<{len(value)} bytes>"
+        else:
+            described[name] = value
+    return described
+
+
+class QueryProfiler:
+    """Sampled FT.PROFILE slow-query log backed by a capped Redis stream."""
+
+    def __init__(self):
+        self.redis_client = get_redis_client()
+        self.sample_rate = settings.query_profile_sample_rate
+        self.slow_ms = settings.query_profile_slow_ms
+        self.stream = settings.query_profile_stream
+        self.maxlen = settings.query_profile_maxlen
+        self.queue_size = settings.query_profile_queue_size
+        self.shape_interval = settings.query_profile_shape_interval_seconds
+        self._lock = threading.Lock()
+        self._queued = 0
+        self._last_profiled: Dict[str, float] = {}
+        # Profiling re-runs the query, so keep it off the request path.
+        self._executor = ThreadPoolExecutor(
+            max_workers=1, thread_name_prefix="query-profiler"
+        )
+
+    def observe(
+        self,
+        query: Union[Query, AggregateRequest],
+        query_params: Optional[Dict[str, Any]],
+        duration_ms: float,
+        error: Optional[str] = None,
+    ) -> None:
+        """Decide whether a finished search should be logged and profiled."""
+        if error is not None:
+            reason = "error"
+        elif duration_ms >= self.slow_ms:
+            reason = "slow"
+        elif random.random() < self.sample_rate:
+            reason = "sampled"
+        else:
+            return
+
+        # Every selected query is logged, but when Redis itself is slow every
+        # query crosses the threshold, so cap both the backlog and how often
+        # each shape is re-run with FT.PROFILE rather than doubling the load
+        # at the worst moment.
+        shape = query_shape(_query_text(query))
+        skipped = None
+        if error is None:
+            now = time.monotonic()
+            with self._lock:
+                if self._queued >= self.queue_size:
+                    skipped = "queue_full"
+                elif (
+                    now - self._last_profiled.get(shape, float("-inf"))
+                    < self.shape_interval
+                ):
+                    skipped = "rate_limited"
+                else:
+                    self._last_profiled[shape] = now
+                    self._queued += 1
+
+        if error is not None or skipped is not None:
+            if skipped is not None:
+                PROFILES_DROPPED.labels(reason=skipped).inc()
+            # A single XADD is cheap enough to run inline.
+            self._log(query, query_params, duration_ms, reason, None, error, skipped)
+            return
+
+        future = self._executor.submit(
+            self._profile_and_log, query, query_params, duration_ms, reason
+        )
+        future.add_done_callback(self._on_done)
+
+    def _on_done(self, future) -> None:
+        with self._lock:
+            self._queued -= 1
+
+    def _profile_and_log(
+        self,
+        query: Union[Query, AggregateRequest],
+        query_params: Optional[Dict[str, Any]],
+        duration_ms: float,
+        reason: str,
+    ) -> None:
+        profile: Any = None
+        error = None
+        try:
+            _, profile = self.redis_client.ft(settings.search_index_name).profile(
+                query, query_params=query_params
+            )
+            profile = getattr(profile, "info", profile)
+        except Exception as e:
+            error = f"FT.PROFILE failed: {e}"
+        self._log(query, query_params, duration_ms, reason, profile, error, None)
+
+    def _log(
+        self,
+        query: Union[Query, AggregateRequest],
+        query_params: Optional[Dict[str, Any]],
+        duration_ms: float,
+        reason: str,
+        profile: Any,
+        error: Optional[str],
+        skipped: Optional[str],
+    ) -> None:
+        query_string = _query_text(query)
+        entry = {
+            "shape": query_shape(query_string),
+            "query": query_string,
+            "params": json.dumps(_describe_params(query_params)),
+            "duration_ms": f"{duration_ms:.3f}",
+            "reason": reason,
+            "profile": "" if profile is None else json.dumps(profile, default=str),
+            "timestamp": time.time(),
+        }
+        if error is not None:
+            entry["error"] = error
+        if skipped is not None:
+            entry["profile_skipped"] = skipped
+
+        try:
+            self.redis_client.xadd(
+                self.stream, entry, maxlen=self.maxlen, approximate=True
+            )
+        except Exception as e:
+            print(f"Query profiler error: {e}")
+
+    def close(self) -> None:
+        """Wait for queued profiles to be written and stop the worker thread."""
+        self._executor.shutdown(wait=True)
+
+    def recent(self, count: int = 100) -> List[Dict[str, Any]]:
+        """Return the most recent slow-query log entries, newest first."""
+        entries = self.redis_client.xrevrange(self.stream, count=count)
+        results = []
+        for entry_id, fields in entries:
+            results.append(
+                {
+                    "id": entry_id,
+                    "shape": fields["shape"],
+                    "query": fields["query"],
+                    "params": json.loads(fields["params"]),
+                    "duration_ms": float(fields["duration_ms"]),
+                    "reason": fields["reason"],
+                    "error": fields.get("error"),
+                    "profile": (
+                        json.loads(fields["profile"]) if fields["profile"] else None
+                    ),
+                    "profile_skipped": fields.get("profile_skipped"),
+                    "timestamp": float(fields["timestamp"]),
+                }
+            )
+        return results
+
+    def slowest_shapes(self, limit: int = 10) -> List[Dict[str, Any]]:
+        """Aggregate the logged queries by shape, slowest maximum first."""
+        shapes: Dict[str, Dict[str, Any]] = {}
+        for entry in self.recent(self.maxlen):
+            stats = shapes.setdefault(
+                entry["shape"],
+                {
+                    "shape": entry["shape"],
+                    "count": 0,
+                    "total_ms": 0.0,
+                    "max_ms": 0.0,
+                    "errors": 0,
+                    "example": entry["query"],
+                },
+            )
+            stats["count"] += 1
+            stats["total_ms"] += entry["duration_ms"]
+            if entry["error"]:
+                stats["errors"] += 1
+            if entry["duration_ms"] > stats["max_ms"]:
+                stats["max_ms"] = entry["duration_ms"]
+                stats["example"] = entry["query"]
+
+        ranked = sorted(shapes.values(), key=lambda s: s["max_ms"], reverse=True)
+        for stats in ranked:
+            stats["avg_ms"] = stats.pop("total_ms") / stats["count"]
+        return ranked[:limit]
+
+
+@lru_cache
+def get_query_profiler() -> QueryProfiler:
+    return QueryProfiler()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="List the slowest query shapes.")
+    parser.add_argument("--limit", type=int, default=10)
+    args = parser.parse_args()
+
+    for stats in get_query_profiler().slowest_shapes(args.limit):
+        print(
+            f"{stats['max_ms']:10.2f} ms max {stats['avg_ms']:10.2f} ms avg "
+            f"{stats['count']:6d}x  {stats['shape']}"
+        )
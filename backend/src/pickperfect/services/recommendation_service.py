@@ -1,18 +1,26 @@
 import json
 import time
-from typing import List
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
 
 import numpy as np
 
 from ..core.database import get_redis_client
+from ..core.metrics import timed
 from ..models.event import EventType
 from ..models.product import Product
-from .product_service import product_service
+from .product_service import get_product_service
+
+RECOMMENDATION_LIMIT = 10
+# Over-fetch so enough candidates remain after removing products the user
+# has already interacted with.
+CANDIDATE_LIMIT = min(RECOMMENDATION_LIMIT * 3, 100)
 
 
 class RecommendationService:
     def __init__(self):
         self.redis_client = get_redis_client()
+        self.product_service = get_product_service()
         self.event_weights = {EventType.CLICK: 2, EventType.ADD_TO_CART: 5}
 
     def calculate_time_decay(
@@ -22,13 +30,8 @@ class RecommendationService:
         hours_passed = (time.time() - timestamp) / 3600
         return np.exp(-decay_factor * hours_passed)
 
-    def get_personalized_recommendations(self, user_email: str) -> List[Product]:
-        """Get personalized recommendations for a user."""
-        user_events = self.redis_client.lrange(f"user_events:{user_email}", 0, 100)
-
-        if not user_events:
-            return product_service.get_trending_products(10)
-
+    def score_events(self, user_events: List[str]) -> Dict[str, float]:
+        """Aggregate a user's events into time-decayed per-product scores."""
         product_scores = {}
 
         for event_str in user_events:
@@ -45,25 +48,77 @@ class RecommendationService:
 
             product_scores[product_id] = product_scores.get(product_id, 0) + final_score
 
-        if not product_scores:
-            return product_service.get_trending_products(10)
+        return product_scores
 
-        # Create user preference vector
+    def preference_vector(
+        self, product_scores: Dict[str, float], embeddings: Dict[str, Any]
+    ) -> Optional[np.ndarray]:
+        """Build the user preference vector from score-weighted embeddings."""
         weighted_vectors = []
 
         for product_id, score in product_scores.items():
+            embedding = embeddings.get(product_id)
+            if embedding:
+                embedding = np.array(embedding).astype(np.float32).reshape(-1)
+                weighted_vectors.append(embedding * score)
+
+        if not weighted_vectors:
+            return None
+        with timed("numpy"):
+            return np.mean(weighted_vectors, axis=0)
+
+    def rank_precomputed(
+        self, cached: Optional[str], product_scores: Dict[str, float]
+    ) -> Optional[List[Product]]:
+        """Serve a list stored by the batch job, minus products seen since.
+
+        Returns None when there is no usable list, so the caller computes
+        recommendations on demand instead.
+        """
+        if cached is None:
+            return None
+        # The list may be up to a TTL old, so drop anything the user has
+        # interacted with in the meantime, as the on-demand path does.
+        product_ids = [
+            product_id
+            for product_id in json.loads(cached)
+            if product_id not in product_scores
+        ][:RECOMMENDATION_LIMIT]
+        if not product_ids:
+            return None
+        keys = [f"product:{product_id}" for product_id in product_ids]
+        documents = self.product_service.get_documents(keys)
+        return [Product(**data) for data in documents if data]
+
+    def get_personalized_recommendations(self, user_email: str) -> List[Product]:
+        """Get personalized recommendations for a user."""
+        pipe = self.redis_client.pipeline(transaction=False)
+        pipe.lrange(f"user_events:{user_email}", 0, 100)
+        pipe.get(f"recommendations:{user_email}")
+        user_events, cached = pipe.execute()
+
+        product_scores = self.score_events(user_events) if user_events else {}
+
+        precomputed = self.rank_precomputed(cached, product_scores)
+        if precomputed is not None:
+            return precomputed
+
+        if not product_scores:
+            return self.product_service.get_trending_products(10)
+
+        embeddings = {}
+        for product_id in product_scores:
             embedding = self.redis_client.json().get(
                 f"product:{product_id}", "$.embedding"
             )
             if embedding:
-                embedding = np.array(embedding).astype(np.float32)
-                weighted_vectors.append(embedding * score)
+                embeddings[product_id] = embedding[0]
+
+        user_preference_vector = self.preference_vector(product_scores, embeddings)
 
-        if weighted_vectors:
-            user_preference_vector = np.mean(weighted_vectors, axis=0)
-            initial_limit = min(10 * 3, 100)
-            results = product_service.vector_search_embed(
-                user_preference_vector, initial_limit
+        if user_preference_vector is not None:
+            results = self.product_service.vector_search_embed(
+                user_preference_vector, CANDIDATE_LIMIT
             )
 
             recommendations = []
@@ -72,9 +127,11 @@ class RecommendationService:
                     continue
                 recommendations.append(res)
 
-            return recommendations[:10]
+            return recommendations[:RECOMMENDATION_LIMIT]
 
         return []
 
 
-recommendation_service = RecommendationService()
+@lru_cache
+def get_recommendation_service() -> RecommendationService:
+    return RecommendationService()
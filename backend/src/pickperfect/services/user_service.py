@@ -1,7 +1,10 @@
 import json
 from datetime import datetime
+from functools import lru_cache
 from typing import Any, Dict, Optional
 
+import redis
+
 from ..config.settings import settings
 from ..core.database import get_redis_client
 from ..core.security import hash_password, verify_password
@@ -12,6 +15,15 @@ class UserService:
     def __init__(self):
         self.redis_client = get_redis_client()
 
+        # Initialize bloom filter
+        try:
+            self.redis_client.bf().reserve(
+                settings.redis_bloom_filter, errorRate=0.01, capacity=1000
+            )
+        except redis.exceptions.ResponseError as e:
+            if "exists" not in str(e).lower():
+                raise
+
     def user_may_exist(self, email: str) -> bool:
         """Check if user may exist using bloom filter."""
         return self.redis_client.bf().exists(settings.redis_bloom_filter, email)
@@ -66,4 +78,6 @@ class UserService:
         return user
 
 
-user_service = UserService()
+@lru_cache
+def get_user_service() -> UserService:
+    return UserService()
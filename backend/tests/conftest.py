@@ -0,0 +1,22 @@
+import fakeredis
+import pytest
+from redis.commands.json.commands import JSONCommands
+
+
+@pytest.fixture
+def redis_client(monkeypatch):
+    """In-memory Redis with JSON and stream support."""
+    # fakeredis unwraps a single JSONPath match in JSON.MGET replies, while
+    # Redis returns a list of matches per key; restore the Redis shape.
+    mget = JSONCommands.mget
+
+    def json_mget(self, keys, path):
+        replies = mget(self, keys, path)
+        if not path.startswith("$"):
+            return replies
+        return [None if reply is None else [reply] for reply in replies]
+
+    monkeypatch.setattr(JSONCommands, "mget", json_mget)
+    client = fakeredis.FakeRedis(decode_responses=True)
+    yield client
+    client.flushall()
@@ -0,0 +1,130 @@
+import json
+import os
+
+import numpy as np
+import pytest
+
+from pickperfect.config.settings import settings
+from pickperfect.core.local_vectors import (
+    LocalVectorIndex,
+    LocalVectorWriter,
+    _valid_path,
+)
+
+EMBEDDINGS = {
+    "1": [1.0, 0.0],
+    "2": [0.6, 0.8],
+    "3": [0.0, 1.0],
+}
+
+
+@pytest.fixture
+def path(tmp_path):
+    return str(tmp_path / "local_vectors")
+
+
+@pytest.fixture
+def writer(redis_client, path):
+    redis_client.xgroup_create(
+        settings.products_stream, settings.indexer_group, id="0-0", mkstream=True
+    )
+    for product_id, embedding in EMBEDDINGS.items():
+        publish(redis_client, product_id, embedding)
+    acknowledge(redis_client)
+    writer = LocalVectorWriter(path, redis_client)
+    assert writer.build() == len(EMBEDDINGS)
+    return writer
+
+
+def publish(redis_client, product_id, embedding=None, field="product"):
+    """Write a product the way the indexer would and queue its stream entry."""
+    if embedding is None:
+        redis_client.delete(f"product:{product_id}")
+    else:
+        redis_client.json().set(
+            f"product:{product_id}", "$", {"id": product_id, "embedding": embedding}
+        )
+    return redis_client.xadd(
+        settings.products_stream, {field: json.dumps({"id": product_id})}
+    )
+
+
+def acknowledge(redis_client):
+    """Deliver and acknowledge every new entry as the indexer group."""
+    messages = redis_client.xreadgroup(
+        settings.indexer_group, "indexer", {settings.products_stream: ">"}
+    )
+    ids = [entry_id for _, entries in messages for entry_id, _ in entries]
+    if ids:
+        redis_client.xack(settings.products_stream, settings.indexer_group, *ids)
+
+
+def search(path, queries, k=10):
+    # A fresh reader maps the latest generation without waiting for the
+    # reload interval.
+    return LocalVectorIndex(path).search(np.asarray(queries, dtype=np.float32), k)
+
+
+def test_search_without_snapshot_falls_back(path):
+    assert search(path, [[1.0, 0.0]]) is None
+
+
+def test_build_ranks_by_cosine_similarity(writer, path):
+    results = search(path, [[1.0, 0.1], [0.0, 2.0]], k=2)
+    assert results == [["product:1", "product:2"], ["product:3", "product:2"]]
+
+
+def test_query_dimension_mismatch_falls_back(writer, path):
+    assert search(path, [[1.0, 0.0, 0.0]]) is None
+
+
+def test_sync_waits_for_the_indexer(writer, redis_client, path):
+    publish(redis_client, "4", [0.8, -0.6])
+
+    assert writer.sync() == 0
+    assert "product:4" not in search(path, [[1.0, -1.0]])[0]
+
+    acknowledge(redis_client)
+    assert writer.sync() == 1
+    assert search(path, [[1.0, -1.0]], k=1) == [["product:4"]]
+    assert writer.sync() == 0
+
+
+def test_removed_product_is_masked_out(writer, redis_client, path):
+    publish(redis_client, "1", field="update")
+    acknowledge(redis_client)
+    writer.sync()
+
+    # Every remaining score is <= 0, which a zeroed row would have beaten.
+    assert search(path, [[-1.0, 0.0]], k=3) == [["product:3", "product:2"]]
+
+    publish(redis_client, "1", [1.0, 0.0])
+    acknowledge(redis_client)
+    writer.sync()
+    assert search(path, [[1.0, 0.0]], k=1) == [["product:1"]]
+
+
+def test_sync_skips_malformed_entries(writer, redis_client, path):
+    redis_client.xadd(settings.products_stream, {"product": "{not json"})
+    publish(redis_client, "4", [0.8, -0.6])
+    last_id = publish(redis_client, "5", [-1.0, 0.0])
+    acknowledge(redis_client)
+
+    assert writer.sync() == 2
+    assert writer._cursor() == last_id
+    assert search(path, [[-1.0, 0.0]], k=1) == [["product:5"]]
+
+
+def test_sync_resumes_after_reopen(writer, redis_client, path):
+    publish(redis_client, "4", [0.8, -0.6])
+    acknowledge(redis_client)
+
+    reopened = LocalVectorWriter(path, redis_client)
+    assert reopened.open()
+    assert reopened.sync() == 1
+    assert search(path, [[1.0, -1.0]], k=1) == [["product:4"]]
+
+
+def test_snapshot_without_validity_mask_is_rebuilt(writer, redis_client, path):
+    os.remove(_valid_path(path, writer.meta["generation"]))
+    assert not LocalVectorWriter(path, redis_client).open()
@@ -0,0 +1,67 @@
+from stream_maintenance import safe_trim_id, trim_acknowledged
+
+STREAM = "products_stream"
+
+
+def _read(redis_client, group, count=None):
+    messages = redis_client.xreadgroup(group, "c1", {STREAM: ">"}, count=count)
+    return [entry_id for _, entries in messages for entry_id, _ in entries]
+
+
+def _next_id(entry_id):
+    ms, seq = entry_id.split("-")
+    return f"{ms}-{int(seq) + 1}"
+
+
+def test_no_groups_means_nothing_is_safe_to_trim(redis_client):
+    redis_client.xadd(STREAM, {"n": 1})
+    assert safe_trim_id(redis_client, STREAM) is None
+    assert safe_trim_id(redis_client, "missing_stream") is None
+    assert trim_acknowledged(redis_client, STREAM) == 0
+
+
+def test_fully_acknowledged_group_trims_past_last_delivered(redis_client):
+    ids = [redis_client.xadd(STREAM, {"n": i}) for i in range(3)]
+    redis_client.xgroup_create(STREAM, "indexers", id="0-0")
+    redis_client.xack(STREAM, "indexers", *_read(redis_client, "indexers"))
+
+    assert safe_trim_id(redis_client, STREAM) == _next_id(ids[-1])
+
+
+def test_undelivered_entries_are_kept(redis_client):
+    ids = [redis_client.xadd(STREAM, {"n": i}) for i in range(4)]
+    redis_client.xgroup_create(STREAM, "indexers", id="0-0")
+    redis_client.xack(STREAM, "indexers", *_read(redis_client, "indexers", count=2))
+
+    assert safe_trim_id(redis_client, STREAM) == _next_id(ids[1])
+
+
+def test_oldest_pending_entry_bounds_the_trim(redis_client):
+    ids = [redis_client.xadd(STREAM, {"n": i}) for i in range(4)]
+    redis_client.xgroup_create(STREAM, "indexers", id="0-0")
+    delivered = _read(redis_client, "indexers")
+    # The second entry failed and stays pending; later ones were acked.
+    redis_client.xack(STREAM, "indexers", delivered[0], *delivered[2:])
+
+    assert safe_trim_id(redis_client, STREAM) == ids[1]
+
+
+def test_slowest_group_wins(redis_client):
+    ids = [redis_client.xadd(STREAM, {"n": i}) for i in range(4)]
+    redis_client.xgroup_create(STREAM, "indexers", id="0-0")
+    redis_client.xack(STREAM, "indexers", *_read(redis_client, "indexers"))
+    redis_client.xgroup_create(STREAM, "local_vectors", id=ids[0])
+
+    assert safe_trim_id(redis_client, STREAM) == _next_id(ids[0])
+
+
+def test_trim_never_removes_entries_a_group_still_needs(redis_client):
+    ids = [redis_client.xadd(STREAM, {"n": i}) for i in range(10)]
+    redis_client.xgroup_create(STREAM, "indexers", id="0-0")
+    delivered = _read(redis_client, "indexers")
+    redis_client.xack(STREAM, "indexers", *delivered[:4], *delivered[5:])
+
+    trim_acknowledged(redis_client, STREAM)
+
+    remaining = [entry_id for entry_id, _ in redis_client.xrange(STREAM)]
+    assert remaining[-6:] == ids[4:]